@@ -1,15 +1,95 @@
-from fastapi import FastAPI, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import argparse
+import secrets
+import shutil
+import signal
+import threading
+from collections import OrderedDict, deque
+import numpy as np
 import pandas as pd
 import joblib
-from pydantic import BaseModel
+import sklearn.preprocessing  # requis pour dépickler le scaler et les encodeurs ; compté dans import_s
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
+# Temps d'import des dépendances (rapport de démarrage)
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
-app = FastAPI()
+logger = logging.getLogger('uvicorn.error')
 
-# Charger modèle, scaler et encodeurs au démarrage
-model = joblib.load('model/eligibility_model_rf_optimized.pkl')
-scaler = joblib.load('model/scaler_optimized.pkl')
-le_dict = joblib.load('model/label_encoders.pkl')
+# Démarrage : préchargement du modèle en arrière-plan (/ready ne passe au vert qu'après le préchauffage),
+# micro-batching et gestion du drainage à l'arrêt ; arrêt : libération de la file d'attente
+@asynccontextmanager
+async def lifespan(app):
+    install_drain_handlers(asyncio.get_running_loop())
+    if registry.active is None and registry.loading is None:
+        registry.load_in_background(registry.default_version())
+    if MICROBATCH_ENABLED:
+        await batcher.start()
+    yield
+    if MICROBATCH_ENABLED:
+        await batcher.stop()
+
+# Arrêt en deux temps : au premier SIGINT/SIGTERM, le worker se déclare en drainage (/ready répond 503)
+# et continue de servir DRAIN_SECONDS, le temps que le répartiteur de charge le retire ; le gestionnaire
+# d'uvicorn (fermeture des sockets, attente des requêtes en cours) n'est appelé qu'ensuite.
+# Installé depuis le lifespan, donc dans chaque worker, après la capture des signaux par uvicorn.
+def install_drain_handlers(loop):
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        original = signal.getsignal(sig)
+        if not callable(original):
+            continue
+
+        def handler(signum, frame, original=original):
+            if request_counter.draining or DRAIN_SECONDS <= 0:
+                request_counter.draining = True
+                original(signum, frame)
+                return
+            request_counter.draining = True
+            logger.info("Arrêt demandé : drainage pendant %.1f s avant fermeture des connexions", DRAIN_SECONDS)
+            loop.call_soon_threadsafe(loop.call_later, DRAIN_SECONDS, original, signum, frame)
+
+        signal.signal(sig, handler)
+
+app = FastAPI(lifespan=lifespan)
+
+# Artefacts du modèle : le lot "base" est à la racine de model/, les lots versionnés dans model/versions/<version>/
+MODEL_DIR = 'model'
+MODEL_VERSIONS_DIR = os.path.join(MODEL_DIR, 'versions')
+BASE_VERSION = 'base'
+MODEL_FILE = 'eligibility_model_rf_optimized.pkl'
+SCALER_FILE = 'scaler_optimized.pkl'
+ENCODERS_FILE = 'label_encoders.pkl'
+FEATURES_FILE = 'features.json'
+# Forêt précompilée en tableaux .npy non compressés, ouverts en mémoire partagée (mmap) par tous les workers
+COMPILED_DIR = 'compiled'
+MODEL_MMAP = os.environ.get('QG_MODEL_MMAP', '1') == '1'
+
+# Version à activer au démarrage (par défaut : la plus récente de model/versions, sinon "base")
+MODEL_VERSION = os.environ.get('QG_MODEL_VERSION')
+
+# Durée maximale d'une requête en secondes (réponse 504 au-delà)
+REQUEST_TIMEOUT = float(os.environ.get('QG_REQUEST_TIMEOUT', '30'))
+
+# Délai (s) entre le signal d'arrêt et la fermeture des sockets, pendant lequel /ready répond 503.
+# Nul par défaut (uvicorn --reload, Ctrl+C en développement) ; serve() applique SERVE_DRAIN_SECONDS
+DRAIN_SECONDS = float(os.environ.get('QG_DRAIN_SECONDS', '0'))
+SERVE_DRAIN_SECONDS = 5
+
+# Clé exigée (en-tête X-Admin-Key) par les endpoints /admin ; sans QG_ADMIN_KEY, ils sont désactivés
+ADMIN_KEY = os.environ.get('QG_ADMIN_KEY')
 
 # Liste des features dans l'ordre exact attendu par le modèle
 FEATURES = [
@@ -18,6 +98,22 @@ FEATURES = [
     'a_til_elle_deja_donne_le_sang', 'taux_dhemoglobine', 'imc', 'jours_depuis_dernier_don'
 ]
 
+# Date de référence pour le calcul des jours depuis le dernier don
+REF_DATE = pd.Timestamp('2025-03-18')
+
+# Nombre maximal de lignes acceptées par /predict/batch
+BATCH_MAX_ROWS = 50000
+
+# Micro-batching de /predict (désactivé par défaut) : fenêtre d'attente, taille max d'un lot et de la file
+MICROBATCH_ENABLED = os.environ.get('QG_MICROBATCH', '0') == '1'
+MICROBATCH_WINDOW_MS = float(os.environ.get('QG_MICROBATCH_WINDOW_MS', '3'))
+MICROBATCH_MAX_SIZE = int(os.environ.get('QG_MICROBATCH_MAX_SIZE', '64'))
+MICROBATCH_QUEUE_MAX = int(os.environ.get('QG_MICROBATCH_QUEUE_MAX', '2048'))
+
+# Cache des prédictions : nombre d'entrées (0 pour désactiver) et durée de vie en secondes
+CACHE_SIZE = int(os.environ.get('QG_CACHE_SIZE', '4096'))
+CACHE_TTL = float(os.environ.get('QG_CACHE_TTL', '3600'))
+
 # Fonction pour calculer l'IMC
 def calculate_imc(taille, poids):
     return poids / ((taille/100) ** 2) if taille > 0 else -1
@@ -38,71 +134,847 @@ class PredictionInput(BaseModel):
     si_oui_preciser_la_date_du_dernier_don: str  # Format YYYY-MM-DD ou vide
     taux_dhemoglobine: float
 
-# Fonction pour encoder les données
-def encode_input(data: dict):
-    encoded = {}
-    for feature in FEATURES:
-        if feature == 'age':
-            encoded[feature] = data['age']
-        elif feature == 'taille':
-            encoded[feature] = data['taille']
-        elif feature == 'poids':
-            encoded[feature] = data['poids']
-        elif feature == 'taux_dhemoglobine':
-            encoded[feature] = data['taux_dhemoglobine']
-        elif feature == 'imc':
-            encoded[feature] = calculate_imc(data['taille'], data['poids'])
-        elif feature == 'jours_depuis_dernier_don':
-            ref_date = pd.Timestamp('2025-03-18')
-            date_input = data['si_oui_preciser_la_date_du_dernier_don']
-            if date_input.strip() and data['a_til_elle_deja_donne_le_sang'].lower() == 'oui':
-                date = pd.to_datetime(date_input, errors='coerce')
-                encoded[feature] = (date - ref_date).days if not pd.isna(date) else -1
+# Champs d'entrée (mêmes noms que les colonnes de volontaire_clean_corrige.csv)
+INPUT_FIELDS = list(PredictionInput.__annotations__)
+
+# Encodeur précompilé : les tables de correspondance sont construites une seule fois au démarrage
+class FeatureEncoder:
+    NUMERIC = ('age', 'taille', 'poids', 'taux_dhemoglobine')
+
+    def __init__(self, le_dict, features=FEATURES, ref_date=REF_DATE):
+        self.features = list(features)
+        self.ref_date = pd.Timestamp(ref_date)
+        self.ref_datetime = self.ref_date.to_pydatetime()
+        # Table dict (une ligne) et index pandas (lot) pour chaque variable catégorielle ; -1 si inconnue
+        self.tables = {}
+        self.indexes = {}
+        for feature in self.features:
+            if feature in le_dict:
+                classes = le_dict[feature].classes_
+                self.tables[feature] = {str(classe): float(code) for code, classe in enumerate(classes)}
+                self.indexes[feature] = pd.Index([str(classe) for classe in classes])
+
+    def _days_since_last_donation(self, date_input, a_donne):
+        if not date_input.strip() or a_donne.lower() != 'oui':
+            return -1.0
+        try:
+            date = datetime.fromisoformat(date_input.strip())
+            return float((date - self.ref_datetime).days)
+        except (ValueError, TypeError):
+            # Formats non ISO : même comportement que pd.to_datetime
+            date = pd.to_datetime(date_input, errors='coerce')
+            return float((date - self.ref_date).days) if not pd.isna(date) else -1.0
+
+    # Encoder un seul enregistrement (dict) dans une ligne float64
+    def encode_one(self, data: dict, out=None):
+        row = np.empty(len(self.features), dtype=np.float64) if out is None else out
+        for j, feature in enumerate(self.features):
+            if feature in self.NUMERIC:
+                row[j] = data[feature]
+            elif feature == 'imc':
+                row[j] = calculate_imc(data['taille'], data['poids'])
+            elif feature == 'jours_depuis_dernier_don':
+                row[j] = self._days_since_last_donation(
+                    data['si_oui_preciser_la_date_du_dernier_don'], data['a_til_elle_deja_donne_le_sang'])
             else:
-                encoded[feature] = -1
+                table = self.tables.get(feature)
+                row[j] = table.get(str(data[feature]), -1.0) if table is not None else -1.0
+        row[np.isnan(row)] = -1
+        return row.reshape(1, -1) if out is None else row
+
+    # Encoder un lot (DataFrame, liste de dicts ou tableau NumPy dans l'ordre INPUT_FIELDS)
+    def encode_batch(self, records, out=None):
+        if isinstance(records, pd.DataFrame):
+            df = records
+        elif isinstance(records, np.ndarray):
+            df = pd.DataFrame(records, columns=INPUT_FIELDS)
         else:
+            df = pd.DataFrame.from_records(records, columns=INPUT_FIELDS)
+        n = len(df)
+        matrix = np.empty((n, len(self.features)), dtype=np.float64) if out is None else out[:n]
+        for j, feature in enumerate(self.features):
+            if feature in self.NUMERIC:
+                matrix[:, j] = df[feature].to_numpy(dtype=np.float64)
+            elif feature == 'imc':
+                taille = df['taille'].to_numpy(dtype=np.float64)
+                poids = df['poids'].to_numpy(dtype=np.float64)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    matrix[:, j] = np.where(taille > 0, poids / ((taille / 100) ** 2), -1)
+            elif feature == 'jours_depuis_dernier_don':
+                date_input = df['si_oui_preciser_la_date_du_dernier_don'].astype(str).str.strip()
+                a_donne = (df['a_til_elle_deja_donne_le_sang'].astype(str).str.lower() == 'oui').to_numpy()
+                dates = pd.to_datetime(date_input.where(date_input != ''), errors='coerce', format='ISO8601')
+                # Reprendre les dates non ISO avec l'analyse souple (plus lente)
+                retry = dates.isna().to_numpy() & (date_input != '').to_numpy() & a_donne
+                if retry.any():
+                    dates[retry] = pd.to_datetime(date_input[retry], errors='coerce', format='mixed')
+                jours = (dates - self.ref_date).dt.days.to_numpy(dtype=np.float64, na_value=np.nan)
+                matrix[:, j] = np.where(a_donne & ~np.isnan(jours), jours, -1)
+            elif feature in self.indexes:
+                matrix[:, j] = self.indexes[feature].get_indexer(df[feature].astype(str))
+            else:
+                matrix[:, j] = -1
+        matrix[np.isnan(matrix)] = -1
+        return matrix
+
+# Forêt aléatoire "aplatie" : les arbres sont concaténés dans des tableaux NumPy et parcourus
+# en parallèle, ce qui évite le coût fixe de predict_proba de scikit-learn sur les petites requêtes
+class CompiledForest:
+    ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'roots')
+
+    def __init__(self, left, right, feature, threshold, value, roots, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_estimators(cls, estimators):
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(n_nodes) + offset
+            # Une feuille pointe sur elle-même : le parcours s'y arrête quel que soit le nombre de pas
+            left.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            right.append(np.where(is_leaf, nodes, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            # Mêmes probabilités par feuille que DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :].astype(np.float64)
+            normalizer = proba.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value.append(proba / normalizer)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(
+            np.concatenate(left).astype(np.intp),
+            np.concatenate(right).astype(np.intp),
+            np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold).astype(np.float64),
+            np.ascontiguousarray(np.concatenate(value)),
+            np.asarray(roots, dtype=np.intp),
+            max_depth
+        )
+
+    # Écrire les tableaux dans un dossier temporaire puis le renommer (plusieurs workers peuvent compiler en même temps)
+    def save(self, directory, source=None):
+        tmp_dir = f"{directory}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'max_depth': int(self.max_depth), 'source': source}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(max_depth=meta['max_depth'], **arrays)
+
+    def predict_proba(self, X):
+        n_rows, n_features = X.shape
+        # scikit-learn compare les entrées en float32 aux seuils : on reproduit la même conversion
+        X_flat = X.astype(np.float32).ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X_flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+# Compiler le modèle s'il s'agit d'une forêt (moyenne des probabilités des arbres), sinon None
+def compile_forest(model):
+    from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+    if not isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)) or getattr(model, 'n_outputs_', 1) != 1:
+        return None
+    return CompiledForest.from_estimators(model.estimators_)
+
+# Empreinte du fichier modèle : une forêt précompilée n'est réutilisée que si le pickle n'a pas changé
+def model_file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+# Moteur d'inférence : standardisation et prédiction sur des ndarray contigus, sans DataFrame
+class InferenceEngine:
+    # Objectifs de latence du temps modèle par requête unitaire (vérifiés par le benchmark)
+    LATENCY_TARGET_P50_MS = 0.5
+    LATENCY_TARGET_P99_MS = 1.0
+    # Au-delà de ce nombre de lignes, predict_proba de scikit-learn (boucle C) est plus rapide ;
+    # sans modèle scikit-learn chargé (forêt en mmap), la forêt compilée traite le lot par tranches
+    COMPILED_MAX_ROWS = 256
+
+    def __init__(self, model, scaler, n_features=len(FEATURES), latency_window=2000, forest=None):
+        self.model = model
+        # Moyenne et écart-type du StandardScaler figés en tableaux NumPy
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self.mean = np.zeros(n_features) if mean is None or not scaler.with_mean else np.array(mean, dtype=np.float64)
+        self.scale = np.ones(n_features) if scale is None or not scaler.with_std else np.array(scale, dtype=np.float64)
+        self.forest = forest if forest is not None else compile_forest(model)
+        if self.model is None and self.forest is None:
+            raise RuntimeError("Ni modèle scikit-learn ni forêt compilée à servir.")
+        self.latencies = deque(maxlen=latency_window)
+
+    def scale_matrix(self, X):
+        return (X - self.mean) / self.scale
+
+    def predict_scaled(self, X_scaled):
+        if self.forest is not None and len(X_scaled) <= self.COMPILED_MAX_ROWS:
+            return self.forest.predict_proba(X_scaled)
+        if self.model is None:
+            step = self.COMPILED_MAX_ROWS
+            return np.vstack([self.forest.predict_proba(X_scaled[i:i + step]) for i in range(0, len(X_scaled), step)])
+        return self.model.predict_proba(X_scaled)
+
+    def predict_proba(self, X):
+        start = time.perf_counter()
+        probabilities = self.predict_scaled(np.ascontiguousarray(self.scale_matrix(X)))
+        if len(X) == 1:
+            self.latencies.append((time.perf_counter() - start) * 1000)
+        return probabilities
+
+    # Percentiles du temps modèle des requêtes unitaires récentes, comparés aux objectifs
+    def latency_report(self):
+        report = {
+            "samples": len(self.latencies),
+            "p50_ms": None,
+            "p99_ms": None,
+            "target_p50_ms": self.LATENCY_TARGET_P50_MS,
+            "target_p99_ms": self.LATENCY_TARGET_P99_MS,
+            "within_target": None,
+            "compiled_forest": self.forest is not None
+        }
+        if self.latencies:
+            p50, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 99])
+            report.update(p50_ms=float(p50), p99_ms=float(p99),
+                          within_target=bool(p50 <= self.LATENCY_TARGET_P50_MS and p99 <= self.LATENCY_TARGET_P99_MS))
+        return report
+
+# Cache LRU/TTL des probabilités, indexé par le vecteur encodé (et non par les chaînes brutes) :
+# deux saisies équivalentes après encodage partagent la même entrée
+class PredictionCache:
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Clé canonique : ligne float64 (le + 0.0 ramène -0.0 à 0.0) et génération du lot de modèle
+    @staticmethod
+    def key(row, generation):
+        return generation, (np.asarray(row, dtype=np.float64) + 0.0).tobytes()
+
+    def get(self, key):
+        if self.maxsize <= 0:
+            return None
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, probability):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = (probability, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+# File pleine : la requête est refusée plutôt que d'allonger indéfiniment l'attente
+class QueueFullError(Exception):
+    pass
+
+# Regroupe les requêtes /predict arrivant dans une courte fenêtre et les score en un seul appel,
+# sur un thread de travail pour ne pas bloquer la boucle d'événements
+class MicroBatcher:
+    def __init__(self, window_ms=MICROBATCH_WINDOW_MS, max_batch_size=MICROBATCH_MAX_SIZE,
+                 max_queue=MICROBATCH_QUEUE_MAX):
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.queue = None
+        self.task = None
+        self.submitted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_depth_seen = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # Libérer les appelants encore en attente
+        while self.queue is not None and not self.queue.empty():
+            _, _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(QueueFullError("Service en cours d'arrêt."))
+
+    # La ligne est scorée par le moteur du modèle avec lequel elle a été encodée
+    async def submit(self, row, engine):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((row, engine, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"File de prédiction pleine ({self.max_queue} requêtes en attente).")
+        self.submitted += 1
+        self.max_depth_seen = max(self.max_depth_seen, self.queue.qsize())
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
             try:
-                encoded[feature] = le_dict[feature].transform([str(data[feature])])[0]
-            except (KeyError, ValueError):
-                encoded[feature] = -1
-    return encoded
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Un lot ne contient normalement qu'un moteur ; plusieurs seulement pendant un changement de version
+            groups = {}
+            for row, engine, future in batch:
+                groups.setdefault(id(engine), (engine, []))[1].append((row, future))
+            for engine, items in groups.values():
+                rows = np.vstack([row for row, _ in items])
+                try:
+                    probabilities = await run_in_threadpool(engine.predict_proba, rows)
+                except Exception as e:
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), probability in zip(items, probabilities):
+                    if not future.done():
+                        future.set_result(probability)
+            self.batches += 1
+            self.rows += len(batch)
+
+    def stats(self):
+        return {
+            "enabled": MICROBATCH_ENABLED,
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queue_capacity": self.max_queue,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth_seen": self.max_depth_seen,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0
+        }
+
+# Lot versionné prêt à servir : encodeur et moteur construits à partir des mêmes artefacts
+class ModelBundle:
+    generations = 0
+
+    def __init__(self, version, model, scaler, le_dict, features=FEATURES, forest=None):
+        # Les matrices encodées sont positionnelles : l'ordre des colonnes doit être celui du scaler
+        if list(getattr(scaler, 'feature_names_in_', features)) != list(features):
+            raise RuntimeError(f"Version {version} : l'ordre des features ne correspond pas à celui du scaler.")
+        self.version = version
+        self.features = list(features)
+        self.encoder = FeatureEncoder(le_dict, features=self.features)
+        self.engine = InferenceEngine(model, scaler, n_features=len(self.features), forest=forest)
+        self.timings = {}
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        # Identifiant unique du chargement (une même version rechargée obtient une nouvelle génération)
+        ModelBundle.generations += 1
+        self.generation = ModelBundle.generations
+
+    # Quelques prédictions synthétiques avant la mise en service (unitaires et en lot)
+    def warmup(self, n=8):
+        start = time.perf_counter()
+        record = {
+            'age': 30, 'taille': 170.0, 'poids': 70.0, 'taux_dhemoglobine': 13.5,
+            'si_oui_preciser_la_date_du_dernier_don': '2024-01-01', 'a_til_elle_deja_donne_le_sang': 'Oui'
+        }
+        for feature in INPUT_FIELDS:
+            if feature not in record:
+                table = self.encoder.tables.get(feature)
+                record[feature] = next(iter(table)) if table else ''
+        for _ in range(n):
+            probability = self.engine.predict_proba(self.encoder.encode_one(record))
+        probabilities = self.engine.predict_proba(self.encoder.encode_batch([record] * n))
+        if probability.shape != (1, 2) or probabilities.shape != (n, 2) or not np.isfinite(probabilities).all():
+            raise RuntimeError(f"Version {self.version} : sortie du modèle invalide pendant le préchauffage.")
+        self.engine.latencies.clear()
+        self.timings['warmup_s'] = time.perf_counter() - start
+
+# Registre des modèles : charge une version en arrière-plan, la préchauffe puis l'active d'un seul coup.
+# Les requêtes en cours gardent le lot qu'elles ont lu, aucune n'est interrompue par un changement.
+class ModelRegistry:
+    def __init__(self, on_swap=None):
+        self.active = None
+        self.previous = None
+        self.on_swap = on_swap
+        self.lock = threading.Lock()
+        self.loading = None
+        self.last_error = None
+
+    @staticmethod
+    def version_dir(version):
+        return MODEL_DIR if version == BASE_VERSION else os.path.join(MODEL_VERSIONS_DIR, version)
+
+    # Ordre naturel des noms de version : v2 < v10, 2024-9 < 2024-10
+    @staticmethod
+    def version_sort_key(version):
+        return [(0, int(part), '') if part.isdigit() else (1, 0, part.lower())
+                for part in re.split(r'(\d+)', version) if part]
+
+    # "base" d'abord, puis les versions de model/versions de la plus ancienne à la plus récente
+    def available_versions(self):
+        versions = [BASE_VERSION] if os.path.exists(os.path.join(MODEL_DIR, MODEL_FILE)) else []
+        if os.path.isdir(MODEL_VERSIONS_DIR):
+            versions += sorted((v for v in os.listdir(MODEL_VERSIONS_DIR)
+                                if os.path.exists(os.path.join(MODEL_VERSIONS_DIR, v, MODEL_FILE))),
+                               key=self.version_sort_key)
+        return versions
+
+    def default_version(self):
+        if MODEL_VERSION:
+            return MODEL_VERSION
+        versions = self.available_versions()
+        return versions[-1] if versions else BASE_VERSION
+
+    def load_bundle(self, version):
+        if version not in self.available_versions():
+            raise ValueError(f"Version de modèle inconnue : {version}")
+        directory = self.version_dir(version)
+        features = FEATURES
+        features_path = os.path.join(directory, FEATURES_FILE)
+        if os.path.exists(features_path):
+            with open(features_path, encoding='utf-8') as f:
+                features = json.load(f)
+
+        # Forêt précompilée à jour : ouverte en mmap, le pickle du modèle n'est pas désérialisé
+        start = time.perf_counter()
+        model, forest = None, None
+        model_path = os.path.join(directory, MODEL_FILE)
+        compiled_dir = os.path.join(directory, COMPILED_DIR)
+        if MODEL_MMAP and os.path.exists(os.path.join(compiled_dir, 'meta.json')):
+            forest = CompiledForest.load(compiled_dir)
+            with open(os.path.join(compiled_dir, 'meta.json'), encoding='utf-8') as f:
+                if json.load(f).get('source') != model_file_signature(model_path):
+                    logger.warning("Forêt précompilée de la version %s périmée, rechargement du pickle.", version)
+                    forest = None
+        if forest is None:
+            model = joblib.load(model_path)
+        scaler = joblib.load(os.path.join(directory, SCALER_FILE))
+        le_dict = joblib.load(os.path.join(directory, ENCODERS_FILE))
+        unpickle_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bundle = ModelBundle(version, model, scaler, le_dict, features=features, forest=forest)
+        bundle.timings.update(
+            import_s=IMPORT_SECONDS,
+            unpickle_s=unpickle_seconds,
+            build_s=time.perf_counter() - start,
+            mmap=forest is not None
+        )
+        bundle.warmup()
+        bundle.timings['total_s'] = IMPORT_SECONDS + unpickle_seconds + bundle.timings['build_s'] + bundle.timings['warmup_s']
+        logger.info("Modèle %s prêt : %s", version, {k: round(v, 4) if isinstance(v, float) else v for k, v in bundle.timings.items()})
+        return bundle
+
+    # Écrire la forêt compilée d'une version pour les prochains démarrages (lecture en mmap)
+    def compile_version(self, version):
+        directory = self.version_dir(version)
+        model_path = os.path.join(directory, MODEL_FILE)
+        forest = compile_forest(joblib.load(model_path))
+        if forest is None:
+            raise RuntimeError(f"Version {version} : le modèle n'est pas une forêt aléatoire, pas de précompilation.")
+        forest.save(os.path.join(directory, COMPILED_DIR), source=model_file_signature(model_path))
+        return os.path.join(directory, COMPILED_DIR)
+
+    # Remplacement atomique du lot actif ; l'ancien est gardé pour un retour arrière
+    def activate(self, bundle):
+        with self.lock:
+            if self.active is not None and self.active is not bundle:
+                self.previous = self.active
+            self.active = bundle
+        if self.on_swap is not None:
+            self.on_swap(bundle)
+
+    def load(self, version):
+        bundle = self.load_bundle(version)
+        self.activate(bundle)
+        return bundle
+
+    def load_in_background(self, version):
+        with self.lock:
+            if self.loading is not None:
+                raise RuntimeError(f"Chargement de la version {self.loading} déjà en cours.")
+            self.loading = version
+
+        def run():
+            try:
+                self.load(version)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{version} : {e}"
+            finally:
+                self.loading = None
+
+        threading.Thread(target=run, name=f"model-load-{version}", daemon=True).start()
+
+    def rollback(self):
+        if self.previous is None:
+            raise RuntimeError("Aucune version précédente à restaurer.")
+        self.activate(self.previous)
+        return self.active
+
+    def status(self):
+        active, previous = self.active, self.previous
+        return {
+            "active_version": active.version if active else None,
+            "active_loaded_at": active.loaded_at if active else None,
+            "startup_timings": active.timings if active else None,
+            "previous_version": previous.version if previous else None,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "available_versions": self.available_versions()
+        }
+
+prediction_cache = PredictionCache()
+batcher = MicroBatcher()
+# Chaque changement de version invalide le cache des prédictions
+registry = ModelRegistry(on_swap=lambda bundle: prediction_cache.clear())
+
+# Compteur de requêtes du worker (chaque processus a le sien) : total et débit sur une fenêtre glissante
+class RequestCounter:
+    def __init__(self, window_seconds=60):
+        self.window_seconds = window_seconds
+        self.started = time.monotonic()
+        self.total = 0
+        self.timeouts = 0
+        self.buckets = deque()  # [seconde, nombre de requêtes]
+        self.draining = False
+
+    def record(self):
+        now = int(time.monotonic())
+        self.total += 1
+        if self.buckets and self.buckets[-1][0] == now:
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([now, 1])
+        while self.buckets and self.buckets[0][0] <= now - self.window_seconds:
+            self.buckets.popleft()
+
+    def stats(self):
+        now = time.monotonic()
+        while self.buckets and self.buckets[0][0] <= int(now) - self.window_seconds:
+            self.buckets.popleft()
+        elapsed = min(self.window_seconds, max(now - self.started, 1e-9))
+        return {
+            "pid": os.getpid(),
+            "uptime_s": now - self.started,
+            "requests_total": self.total,
+            "requests_per_sec": sum(count for _, count in self.buckets) / elapsed,
+            "timeouts": self.timeouts,
+            "draining": self.draining
+        }
+
+request_counter = RequestCounter()
+
+# Mettre en forme le résultat d'une prédiction
+def format_result(probability, model_version):
+    # Déterminer le résultat basé sur un seuil explicite de 0.5
+    prediction = 1 if probability[1] >= 0.5 else 0
+    result = "Éligible" if prediction == 1 else "Non éligible"
+    return {
+        "result": result,
+        "probability_eligible": float(probability[1]),
+        "probability_not_eligible": float(probability[0]),
+        "model_version": model_version
+    }
+
+def parse_csv_records(source):
+    return pd.read_csv(source, dtype=str, keep_default_na=False).to_dict('records')
+
+# Lire les enregistrements d'un lot (JSON ou CSV) : seule la réception du corps se fait sur la
+# boucle d'événements, l'analyse d'un gros lot passe sur un thread de travail
+async def read_batch_records(request: Request):
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Aucun fichier CSV fourni (champ 'file').")
+        return await run_in_threadpool(parse_csv_records, upload.file)
+    body = await request.body()
+    if content_type.startswith('text/csv'):
+        return await run_in_threadpool(parse_csv_records, io.BytesIO(body))
+    records = await run_in_threadpool(json.loads, body)
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Le corps doit être une liste d'enregistrements.")
+    return records
+
+# Valider chaque ligne séparément pour renvoyer des erreurs par ligne :
+# (résultats avec les erreurs en place, indices valides, enregistrements valides)
+def validate_batch_records(records):
+    results = [None] * len(records)
+    valid_indices, valid_records = [], []
+    for i, record in enumerate(records):
+        try:
+            valid_records.append(PredictionInput(**record).dict())
+            valid_indices.append(i)
+        except (ValidationError, TypeError) as e:
+            results[i] = {"index": i, "error": str(e)}
+    return results, valid_indices, valid_records
+
+# Lot actif, ou 503 tant que le modèle n'est pas chargé et préchauffé
+def active_bundle():
+    bundle = registry.active
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Modèle en cours de chargement.", headers={"Retry-After": "1"})
+    return bundle
+
+# Vérifier la clé des endpoints d'administration
+def check_admin_key(admin_key):
+    if not ADMIN_KEY:
+        raise HTTPException(status_code=404, detail="Endpoints d'administration désactivés (QG_ADMIN_KEY non définie).")
+    if admin_key is None or not secrets.compare_digest(admin_key.encode('utf-8'), ADMIN_KEY.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Clé administrateur invalide.")
+
+# Comptage des requêtes du worker et délai maximal par requête
+@app.middleware("http")
+async def count_and_timeout(request: Request, call_next):
+    request_counter.record()
+    try:
+        return await asyncio.wait_for(call_next(request), timeout=REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        request_counter.timeouts += 1
+        return JSONResponse(status_code=504, content={"detail": f"Délai dépassé ({REQUEST_TIMEOUT:g} s)."})
+
+# Version du modèle dans l'en-tête de chaque réponse (celle réellement utilisée pour les prédictions)
+@app.middleware("http")
+async def add_model_version_header(request: Request, call_next):
+    response = await call_next(request)
+    version = getattr(request.state, 'model_version', None)
+    if version is None and registry.active is not None:
+        version = registry.active.version
+    if version is not None:
+        response.headers['X-Model-Version'] = version
+    return response
 
 @app.post("/predict")
-async def predict_eligibility(input_data: PredictionInput):
+async def predict_eligibility(input_data: PredictionInput, request: Request):
+    # Le lot actif est lu une seule fois : un changement de version n'affecte pas la requête en cours
+    bundle = active_bundle()
+    request.state.model_version = bundle.version
     try:
         # Convertir en dictionnaire
         data = input_data.dict()
         
-        # Encoder les données
-        encoded_data = encode_input(data)
-        
-        # Créer un DataFrame avec les features dans l’ordre exact
-        input_df = pd.DataFrame([encoded_data], columns=FEATURES)
-        
-        # Remplacer les NaN par -1
-        input_df.fillna(-1, inplace=True)
-        
-        # Standardiser les données
-        input_scaled = scaler.transform(input_df)
-        
-        # Faire la prédiction avec les probabilités
-        probability = model.predict_proba(input_scaled)[0]
-        # Déterminer le résultat basé sur un seuil explicite de 0.5
-        prediction = 1 if probability[1] >= 0.5 else 0
-        result = "Éligible" if prediction == 1 else "Non éligible"
+        # Encoder les données directement dans une matrice (1, n_features), NaN remplacés par -1
+        input_matrix = bundle.encoder.encode_one(data)
+
+        # Réutiliser la prédiction d'un vecteur encodé identique
+        cache_key = prediction_cache.key(input_matrix[0], bundle.generation)
+        probability = prediction_cache.get(cache_key)
+        if probability is not None:
+            return format_result(probability, bundle.version)
         
-        return {
-            "result": result,
-            "probability_eligible": float(probability[1]),
-            "probability_not_eligible": float(probability[0])
-        }
+        # Standardiser et prédire les probabilités, regroupées avec d'autres requêtes si activé,
+        # sinon sur un thread de travail pour libérer la boucle d'événements
+        if MICROBATCH_ENABLED:
+            probability = await batcher.submit(input_matrix[0], bundle.engine)
+        else:
+            probability = (await run_in_threadpool(bundle.engine.predict_proba, input_matrix))[0]
+        prediction_cache.put(cache_key, probability)
+        return format_result(probability, bundle.version)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-if __name__ == "__main__":
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    try:
+        records = await read_batch_records(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Lot illisible : {e}")
+    if len(records) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Lot trop grand ({len(records)} > {BATCH_MAX_ROWS} lignes).")
+
+    bundle = active_bundle()
+    request.state.model_version = bundle.version
+
+    # Validation ligne par ligne hors de la boucle d'événements (jusqu'à BATCH_MAX_ROWS lignes)
+    results, valid_indices, valid_records = await run_in_threadpool(validate_batch_records, records)
+
+    if valid_records:
+        try:
+            # Encoder, standardiser et prédire tout le lot en une seule matrice. Le cache des prédictions
+            # n'est pas utilisé : un gros lot en évincerait les entrées chaudes de /predict
+            input_matrix = await run_in_threadpool(bundle.encoder.encode_batch, valid_records)
+            probabilities = await run_in_threadpool(bundle.engine.predict_proba, input_matrix)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for i, probability in zip(valid_indices, probabilities):
+            results[i] = {"index": i, **format_result(probability, bundle.version)}
+
+    return {
+        "model_version": bundle.version,
+        "count": len(records),
+        "errors": len(records) - len(valid_records),
+        "results": results
+    }
+
+@app.get("/stats")
+async def stats():
+    bundle = registry.active
+    return {
+        "model_version": bundle.version if bundle else None,
+        "worker": request_counter.stats(),
+        "latency": bundle.engine.latency_report() if bundle else None,
+        "microbatch": batcher.stats(),
+        "cache": prediction_cache.stats()
+    }
+
+# Vivacité : le processus répond
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid()}
+
+# Disponibilité : vert seulement une fois le modèle préchauffé, et plus pendant l'arrêt
+@app.get("/ready")
+async def ready():
+    bundle = registry.active
+    if bundle is None or request_counter.draining:
+        return JSONResponse(status_code=503, content={
+            "ready": False,
+            "loading": registry.loading,
+            "last_error": registry.last_error,
+            "draining": request_counter.draining
+        })
+    return {"ready": True, "model_version": bundle.version, "pid": os.getpid()}
+
+@app.get("/admin/model")
+async def model_status(x_admin_key: str = Header(None)):
+    check_admin_key(x_admin_key)
+    return registry.status()
+
+# Charger une version en arrière-plan ; elle remplace la version active une fois préchauffée
+@app.post("/admin/model/load", status_code=202)
+async def load_model_version(version: str, x_admin_key: str = Header(None)):
+    check_admin_key(x_admin_key)
+    if version not in registry.available_versions():
+        raise HTTPException(status_code=404, detail=f"Version de modèle inconnue : {version}")
+    try:
+        registry.load_in_background(version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.status()
+
+@app.post("/admin/model/rollback")
+async def rollback_model(x_admin_key: str = Header(None)):
+    check_admin_key(x_admin_key)
+    try:
+        registry.rollback()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.status()
+
+# Serveur de production : N workers indépendants (un par cœur par défaut), chacun avec son propre moteur
+# préchargé ; la forêt précompilée (mmap) est partagée entre eux par le cache de pages du système
+def serve(argv=None):
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="Serveur de production de l'API d'éligibilité (à lancer depuis APPLICATION/)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help="délai maximal d'une requête (s)")
+    parser.add_argument('--graceful-timeout', type=float, default=30, help="attente des requêtes en cours à l'arrêt (s)")
+    parser.add_argument('--drain-seconds', type=float, default=float(os.environ.get('QG_DRAIN_SECONDS', SERVE_DRAIN_SECONDS)), help="délai avant fermeture des sockets à l'arrêt, /ready à 503 (s)")
+    args = parser.parse_args(argv)
+    # Les workers réimportent le module : la configuration leur est transmise par l'environnement
+    os.environ['QG_REQUEST_TIMEOUT'] = str(args.timeout)
+    os.environ['QG_DRAIN_SECONDS'] = str(args.drain_seconds)
+    # Lancé en script, le dossier api/ masque le paquet api : on le retire du chemin d'import
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or '.') != api_dir]
+    uvicorn.run(
+        'api.api:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        timeout_graceful_shutdown=args.graceful_timeout
+    )
+
+if __name__ == "__main__":
+    import sys
+    # python api/api.py compile [version] : précompiler la forêt pour le chargement en mmap
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        print(registry.compile_version(sys.argv[2] if len(sys.argv) > 2 else registry.default_version()))
+    else:
+        serve(sys.argv[1:])
 
 # lib a installer avant : pip install fastapi uvicorn requests '#1E88E5'
 # Démarrer avec : uvicorn api:app --reload 
-# ou avec cette commande (avec une IP et un Port specifique) : uvicorn api.api:app --reload --host 0.0.0.0 --port 8000
\ No newline at end of file
+# ou avec cette commande (avec une IP et un Port specifique) : uvicorn api.api:app --reload --host 0.0.0.0 --port 8000
+# Prédiction par lot : curl -F 'file=@datas/volontaire_clean_corrige.csv' http://localhost:8000/predict/batch
+# Nouvelle version : copier modèle, scaler, encodeurs (et features.json) dans model/versions/<version>/ puis
+# curl -X POST -H "X-Admin-Key: $QG_ADMIN_KEY" "http://localhost:8000/admin/model/load?version=<version>"
+# (endpoints /admin désactivés tant que QG_ADMIN_KEY n'est pas définie côté serveur)
+# Démarrage rapide / mémoire partagée entre workers : python api/api.py compile <version> (écrit <version>/compiled/)
+# Production (depuis APPLICATION/) : python api/api.py --workers 8 --timeout 10 ; sondes : /health et /ready
+# Banc de mesure (débit, p50/p95/p99, répartition encodage/standardisation/modèle) : python -m api.benchmark
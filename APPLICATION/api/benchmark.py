@@ -0,0 +1,315 @@
+# Banc de mesure de l'API d'éligibilité : débit et latence de /predict et /predict/batch,
+# en processus (TestClient) et sur un vrai socket uvicorn, avec la répartition du temps
+# entre encodage, standardisation et modèle.
+#
+# À lancer depuis APPLICATION/ :
+#   python -m api.benchmark                              (en processus + socket, version par défaut)
+#   python -m api.benchmark --version v2 --mode inprocess --requests 2000
+#   python -m api.benchmark --compare cache/benchmarks/benchmark_base.json (écarts avec un résultat précédent)
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DATA_FILE = os.path.join('datas', 'volontaire_clean_corrige.csv')
+# Résultats par défaut dans cache/ (ignoré par git)
+RESULTS_DIR = os.path.join('cache', 'benchmarks')
+INT_FIELDS = ['age']
+FLOAT_FIELDS = ['taille', 'poids', 'taux_dhemoglobine']
+
+
+# Requêtes synthétiques : lignes tirées au hasard du jeu de données, au format PredictionInput
+def load_payloads(n, input_fields, seed=0, path=DATA_FILE):
+    df = pd.read_csv(path, usecols=input_fields)
+    df = df.sample(n=n, replace=len(df) < n, random_state=seed)
+    payloads = []
+    for row in df.to_dict(orient='records'):
+        payload = {}
+        for field in input_fields:
+            value = row[field]
+            if field in INT_FIELDS:
+                payload[field] = int(value) if pd.notna(value) else 0
+            elif field in FLOAT_FIELDS:
+                payload[field] = float(value) if pd.notna(value) else 0.0
+            else:
+                payload[field] = str(value) if pd.notna(value) else ''
+        payloads.append(payload)
+    return payloads
+
+
+def summarize(latencies_ms, elapsed, items):
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (None, None, None)
+    return {
+        "requests": len(latencies),
+        "items": items,
+        "elapsed_s": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else None,
+        "items_per_sec": items / elapsed if elapsed else None,
+        "mean_ms": float(latencies.mean()) if len(latencies) else None,
+        "p50_ms": None if p50 is None else float(p50),
+        "p95_ms": None if p95 is None else float(p95),
+        "p99_ms": None if p99 is None else float(p99),
+        "max_ms": float(latencies.max()) if len(latencies) else None
+    }
+
+
+def timed_post(post, url, payload):
+    start = time.perf_counter()
+    response = post(url, json=payload)
+    latency = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} : HTTP {response.status_code} {response.text[:200]}")
+    return latency
+
+
+# Requêtes unitaires l'une après l'autre
+def run_single(post, payloads):
+    start = time.perf_counter()
+    latencies = [timed_post(post, '/predict', payload) for payload in payloads]
+    return summarize(latencies, time.perf_counter() - start, len(payloads))
+
+
+# Lots JSON de batch_size lignes
+def run_batch(post, payloads, batch_size):
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+    start = time.perf_counter()
+    latencies = [timed_post(post, '/predict/batch', batch) for batch in batches]
+    return summarize(latencies, time.perf_counter() - start, len(payloads))
+
+
+# Requêtes unitaires envoyées par plusieurs clients en parallèle
+def run_concurrent(make_post, payloads, concurrency):
+    chunks = [payloads[i::concurrency] for i in range(concurrency)]
+
+    def client(chunk):
+        post = make_post()
+        return [timed_post(post, '/predict', payload) for payload in chunk]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(client, chunks))
+    summary = summarize([l for chunk in results for l in chunk], time.perf_counter() - start, len(payloads))
+    summary["concurrency"] = concurrency
+    return summary
+
+
+def run_scenarios(post, make_post, payloads, args):
+    # Quelques requêtes de chauffe avant la mesure
+    for payload in payloads[:20]:
+        timed_post(post, '/predict', payload)
+    return {
+        "single": run_single(post, payloads),
+        "batch": run_batch(post, payloads, args.batch_size),
+        "concurrent": run_concurrent(make_post, payloads, args.concurrency)
+    }
+
+
+def stage_stats(samples):
+    samples = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"mean_ms": float(samples.mean()), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+# Répartition du temps par étape, mesurée directement sur le lot de modèle actif (sans HTTP)
+def measure_stages(bundle, payloads, batch_size):
+    encoder, engine = bundle.encoder, bundle.engine
+    stages = {"encode": [], "scale": [], "model": []}
+    for payload in payloads:
+        t0 = time.perf_counter()
+        X = encoder.encode_one(payload)
+        t1 = time.perf_counter()
+        X_scaled = np.ascontiguousarray(engine.scale_matrix(X))
+        t2 = time.perf_counter()
+        engine.predict_scaled(X_scaled)
+        t3 = time.perf_counter()
+        stages["encode"].append((t1 - t0) * 1000)
+        stages["scale"].append((t2 - t1) * 1000)
+        stages["model"].append((t3 - t2) * 1000)
+    single = {stage: stage_stats(samples) for stage, samples in stages.items()}
+    total = sum(s["mean_ms"] for s in single.values())
+    for s in single.values():
+        s["share"] = s["mean_ms"] / total if total else None
+
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+    batch_totals = {"encode": 0.0, "scale": 0.0, "model": 0.0}
+    for records in batches:
+        t0 = time.perf_counter()
+        X = encoder.encode_batch(records)
+        t1 = time.perf_counter()
+        X_scaled = np.ascontiguousarray(engine.scale_matrix(X))
+        t2 = time.perf_counter()
+        engine.predict_scaled(X_scaled)
+        t3 = time.perf_counter()
+        batch_totals["encode"] += t1 - t0
+        batch_totals["scale"] += t2 - t1
+        batch_totals["model"] += t3 - t2
+    total = sum(batch_totals.values())
+    batch = {stage: {"total_s": seconds, "per_row_us": seconds / len(payloads) * 1e6,
+                     "share": seconds / total if total else None}
+             for stage, seconds in batch_totals.items()}
+
+    model = single["model"]
+    targets = {
+        "target_p50_ms": engine.LATENCY_TARGET_P50_MS,
+        "target_p99_ms": engine.LATENCY_TARGET_P99_MS,
+        "model_p50_ms": model["p50_ms"],
+        "model_p99_ms": model["p99_ms"],
+        "within_target": model["p50_ms"] <= engine.LATENCY_TARGET_P50_MS and model["p99_ms"] <= engine.LATENCY_TARGET_P99_MS
+    }
+    return {"single": single, "batch": batch, "batch_size": batch_size}, targets
+
+
+def wait_ready(get, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = get('/ready')
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("L'API n'est pas prête dans le délai imparti.")
+
+
+def benchmark_inprocess(api, payloads, args):
+    from fastapi.testclient import TestClient
+    with TestClient(api.app) as client:
+        wait_ready(client.get)
+        scenarios = run_scenarios(client.post, lambda: client.post, payloads, args)
+        stages, targets = measure_stages(api.registry.active, payloads, args.batch_size)
+        scenarios["server_stats"] = client.get('/stats').json()
+    return scenarios, stages, targets
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def benchmark_socket(payloads, args, env):
+    import requests
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api.api:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(args.workers), '--log-level', 'warning'],
+        env=env
+    )
+
+    def make_post():
+        session = requests.Session()
+        return lambda url, **kwargs: session.post(base_url + url, **kwargs)
+
+    try:
+        session = requests.Session()
+        wait_ready(lambda url: session.get(base_url + url))
+        scenarios = run_scenarios(make_post(), make_post, payloads, args)
+        scenarios["server_stats"] = session.get(base_url + '/stats').json()
+        scenarios["workers"] = args.workers
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return scenarios
+
+
+# Écarts relatifs (latences et débits) avec un résultat précédent, scénario par scénario
+def compare(current, previous):
+    lines = [f"Comparaison {previous.get('model_version')} -> {current.get('model_version')}"]
+    for mode in ('inprocess', 'socket'):
+        for scenario in ('single', 'batch', 'concurrent'):
+            new = (current.get(mode) or {}).get(scenario)
+            old = (previous.get(mode) or {}).get(scenario)
+            if not new or not old:
+                continue
+            deltas = []
+            for metric in ('p50_ms', 'p99_ms', 'items_per_sec'):
+                if old.get(metric):
+                    deltas.append(f"{metric} {old[metric]:.3f} -> {new[metric]:.3f} ({(new[metric] / old[metric] - 1) * 100:+.1f}%)")
+            lines.append(f"  {mode}/{scenario} : " + ', '.join(deltas))
+    return '\n'.join(lines)
+
+
+def print_summary(result):
+    print(f"Modèle {result['model_version']} ({result['config']['requests']} requêtes)")
+    for mode in ('inprocess', 'socket'):
+        for scenario in ('single', 'batch', 'concurrent'):
+            s = (result.get(mode) or {}).get(scenario)
+            if s:
+                print(f"  {mode:9s} {scenario:10s} {s['items_per_sec']:10.1f} lignes/s  "
+                      f"p50 {s['p50_ms']:8.3f} ms  p95 {s['p95_ms']:8.3f} ms  p99 {s['p99_ms']:8.3f} ms")
+    if result.get('stages'):
+        split = ', '.join(f"{stage} {s['mean_ms']:.4f} ms ({s['share']:.0%})" for stage, s in result['stages']['single'].items())
+        print(f"  étapes (unitaire) : {split}")
+        targets = result['targets']
+        print(f"  objectif modèle p50 <= {targets['target_p50_ms']} ms / p99 <= {targets['target_p99_ms']} ms : "
+              f"{'respecté' if targets['within_target'] else 'NON respecté'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure de l'API d'éligibilité (à lancer depuis APPLICATION/)")
+    parser.add_argument('--mode', choices=['inprocess', 'socket', 'all'], default='all')
+    parser.add_argument('--version', help="version de modèle à mesurer (défaut : celle que servirait l'API)")
+    parser.add_argument('--requests', type=int, default=1000, help="nombre de requêtes synthétiques")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=1, help="workers uvicorn en mode socket")
+    parser.add_argument('--cache', action='store_true', help="garder le cache de prédictions (désactivé par défaut)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="fichier JSON de résultats (défaut : cache/benchmarks/benchmark_<version>.json)")
+    parser.add_argument('--compare', help="résultat JSON précédent à comparer")
+    args = parser.parse_args(argv)
+
+    # L'API lit sa configuration à l'import : on la fixe avant de l'importer (et pour le serveur)
+    env = dict(os.environ)
+    if args.version:
+        env['QG_MODEL_VERSION'] = args.version
+    if not args.cache:
+        env['QG_CACHE_SIZE'] = '0'
+    os.environ.update(env)
+    import api.api as api
+
+    version = api.registry.default_version()
+    payloads = load_payloads(args.requests, api.INPUT_FIELDS, seed=args.seed)
+    result = {
+        "model_version": version,
+        "generated_at": datetime.now().isoformat(timespec='seconds'),
+        "config": {
+            "requests": args.requests, "batch_size": args.batch_size, "concurrency": args.concurrency,
+            "workers": args.workers, "cache": args.cache, "microbatch": api.MICROBATCH_ENABLED, "seed": args.seed
+        },
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__
+        }
+    }
+    if args.mode in ('inprocess', 'all'):
+        result["inprocess"], result["stages"], result["targets"] = benchmark_inprocess(api, payloads, args)
+    if args.mode in ('socket', 'all'):
+        result["socket"] = benchmark_socket(payloads, args, env)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'benchmark_{version}.json')
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print_summary(result)
+    print(f"Résultats écrits dans {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(result, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# assets.py
+# Ressources statiques générées (QR code, CSS des thèmes) : calculées une fois par processus
+# puis servies depuis le cache à chaque réexécution de la page.
+import os
+from io import BytesIO
+import streamlit as st
+from instrumentation import timed
+
+# QR code vers la version mobile (URL et couleurs configurables)
+MOBILE_APP_URL = os.environ.get('QG_MOBILE_APP_URL', 'https://qganalytics-blood-dashboard-indabax.streamlit.app/')
+QR_FILL_COLOR = os.environ.get('QG_QR_FILL_COLOR', '#4CAF50')
+QR_BACK_COLOR = os.environ.get('QG_QR_BACK_COLOR', 'white')
+
+# Couleurs des thèmes du tableau de bord
+THEMES = {
+    "Light": {"background": "#ffffff", "text": "#000000", "sidebar": "#f0f2f6", "stat_box": "#e8f5e9",
+              "button": "#4CAF50", "button_hover": "#45a049"},
+    "Dark": {"background": "#1e1e1e", "text": "#ffffff", "sidebar": "#2b2b2b", "stat_box": "#333333",
+             "button": "#4CAF50", "button_hover": "#45a049"}
+}
+
+@st.cache_resource
+def qr_code_png(url=MOBILE_APP_URL, fill_color=QR_FILL_COLOR, back_color=QR_BACK_COLOR):
+    import qrcode
+    with timed("génération QR code"):
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(url)
+        qr.make(fit=True)
+        qr_img = qr.make_image(fill_color=fill_color, back_color=back_color)
+        buf = BytesIO()
+        qr_img.save(buf, format="PNG")
+        return buf.getvalue()
+
+@st.cache_resource
+def theme_css(theme):
+    colors = THEMES.get(theme, THEMES["Light"])
+    return f"""
+        <style>
+        .main {{background-color: {colors['background']}; color: {colors['text']};}}
+        .sidebar .sidebar-content {{background-color: {colors['sidebar']}; color: {colors['text']};}}
+        .stButton>button {{background-color: {colors['button']}; color: white; border-radius: 5px; transition: all 0.3s;}}
+        .stButton>button:hover {{background-color: {colors['button_hover']};}}
+        .stat-box {{background-color: {colors['stat_box']}; color: {colors['text']}; padding: 15px; border-radius: 10px; margin: 10px; text-align: center;}}
+        </style>
+    """
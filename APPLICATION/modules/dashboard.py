@@ -3,35 +3,151 @@ import streamlit as st
 # Configuration de la page
 st.set_page_config(layout="wide", page_title="Blood Donation Dashboard", page_icon="🩸")
 
+import os
+import importlib
 import pandas as pd
-from datetime import datetime
-import qrcode
+from datetime import datetime, timedelta
 from io import BytesIO
-import networkx as nx
-import matplotlib.pyplot as plt
-from module_cartographie import show_cartographie
-from module_conditions import show_conditions
-from module_profilage import show_profilage
-from module_campagnes import show_campagnes
-from module_fidelisation import show_fidelisation
-from module_sentiment import show_sentiment
-from module_prediction import show_prediction
-from module_banque_sang import show_banque_sang
-from module_visualization import show_visualization
-from module_blood_demand_prediction import show_blood_demand_prediction
-
-
-# Charger les données
-@st.cache_data
+from data_store import load_dataset, compact_categories, preload_all
+from filter_index import FilterIndex
+from instrumentation import timed, instrument_module, render_profile, summary, PROFILES
+from assets import qr_code_png, theme_css
+
+
+# Points d'entrée des modules (module, fonction) : chaque module n'est importé qu'à sa première
+# sélection, l'écran de connexion s'affiche sans charger Prophet, scikit-learn, VADER, folium...
+MODULE_ENTRY_POINTS = {
+    "📍 Cartographie des Donneurs": ("module_cartographie", "show_cartographie"),
+    "🏥 Conditions de Santé": ("module_conditions", "show_conditions"),
+    "🔬 Profilage des Donneurs": ("module_profilage", "show_profilage"),
+    "📅 Analyse des Campagnes": ("module_campagnes", "show_campagnes"),
+    "🤝 Fidélisation des Donneurs": ("module_fidelisation", "show_fidelisation"),
+    "💬 Analyse de Sentiment": ("module_sentiment", "show_sentiment"),
+    "🤖 Prédiction d’Éligibilité": ("module_prediction", "show_prediction"),
+    "🩸 Banque de Sang": ("module_banque_sang", "show_banque_sang"),
+    "📉 Prédictions des Besoins": ("module_blood_demand_prediction", "show_blood_demand_prediction"),
+    "📊 Visualisation des Données": ("module_visualization", "show_visualization")
+}
+
+# Import d'un module à la demande, mesuré et journalisé une seule fois par processus
+@st.cache_resource
+def load_module_entry_point(module_key):
+    module_name, function_name = MODULE_ENTRY_POINTS[module_key]
+    with timed(f"import {module_name}"):
+        module = instrument_module(importlib.import_module(module_name))
+    return getattr(module, function_name)
+
+# Rendu d'un module sous profil (préparation / figures / émission, taille des charges si demandé)
+def run_module(module_key, df, lang, measure_payload=False):
+    show = load_module_entry_point(module_key)
+    with render_profile(module_key, measure_payload=measure_payload):
+        return show(df, lang)
+
+# Panneau administrateur : détail du dernier rendu du module et temps cumulés du processus
+def show_render_profile(module_key, lang):
+    profile = PROFILES.get(module_key)
+    st.subheader(translations[lang]["render_profile_title"])
+    if profile is None:
+        st.info(translations[lang]["render_profile_empty"])
+        return
+    col_total, col_prep, col_fig, col_emit, col_bytes = st.columns(5)
+    col_total.metric(translations[lang]["render_total"], f"{profile['total_ms']:.0f} ms")
+    col_prep.metric(translations[lang]["render_preparation"], f"{profile['preparation_ms']:.0f} ms")
+    col_fig.metric(translations[lang]["render_figures"], f"{profile['figure_ms']:.0f} ms")
+    col_emit.metric(translations[lang]["render_emission"], f"{profile['emission_ms']:.0f} ms")
+    col_bytes.metric(translations[lang]["render_payload"], f"{profile['payload_bytes'] / 1024:.0f} Ko")
+    if profile["phases"]:
+        st.dataframe(pd.DataFrame(profile["phases"]), use_container_width=True)
+    with st.expander(translations[lang]["render_timings"]):
+        st.dataframe(pd.DataFrame.from_dict(summary(), orient="index").round(1), use_container_width=True)
+    show_preload_report(lang)
+
+# Rapport du préchargement des sources au démarrage (les sources d'arrière-plan apparaissent une fois chargées)
+def show_preload_report(lang):
+    with st.expander(translations[lang]["preload_title"]):
+        st.caption(translations[lang]["preload_summary"].format(
+            preload_report["wall_s"] * 1000, preload_report["sequential_s"] * 1000, ", ".join(preload_report["background"])))
+        sources = pd.DataFrame.from_dict(dict(preload_report["sources"]), orient="index")
+        if not sources.empty:
+            sources = sources.assign(ms=(sources["seconds"] * 1000).round(1))[["ms", "error"]]
+        st.dataframe(sources, use_container_width=True)
+
+# Précharger en parallèle toutes les sources de l'application (une fois par processus) ;
+# le rapport est affiché dans le panneau de profilage des administrateurs
+preload_report = preload_all()
+
+# Charger les données (déjà typées et mises en cache par data_store, dates comprises)
 def load_data():
-    df_volontaire = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/volontaire_clean_corrige.csv')
-    df_2020 = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/2020_clean.csv')
-    df_dates = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/dates_2019_extraites.csv')
-    df_dates['date_de_remplissage_de_la_fiche'] = pd.to_datetime(df_dates['date_de_remplissage_de_la_fiche'])
+    df_volontaire = load_dataset('volontaire')
+    df_2020 = load_dataset('2020')
+    df_dates = load_dataset('dates_2019')
     return df_volontaire, df_2020, df_dates
 
 df_volontaire, df_2020, df_dates = load_data()
 
+# Index des filtres de la barre latérale, construits une fois par processus
+@st.cache_resource
+def load_filter_indexes():
+    volontaire_index = FilterIndex(load_dataset('volontaire'), range_columns=['age'])
+    dates_index = FilterIndex(load_dataset('dates_2019'), range_columns=['date_de_remplissage_de_la_fiche'])
+    return volontaire_index, dates_index
+
+# Nombre de vues filtrées gardées en mémoire (partagées entre sessions, les moins récentes sont évincées)
+FILTERED_VIEWS_MAX = int(os.environ.get('QG_FILTERED_VIEWS_MAX', '32'))
+
+# Vues filtrées pour un état de filtres normalisé : changer de module sans toucher aux filtres
+# réutilise les mêmes DataFrames. Les modules travaillent sur une copie, les vues ne sont jamais modifiées.
+@st.cache_resource(max_entries=FILTERED_VIEWS_MAX)
+def filtered_views(filter_state):
+    age_range, arrondissements, genre, selected_conditions, dynamic_column, dynamic_values, period = filter_state
+    health_conditions_cols = [col for col in df_volontaire.columns if 'raison_de_non_eligibilite_totale_' in col]
+
+    # Filtrer par ET/OU des ensembles de bits de l'index
+    volontaire_index, dates_index = load_filter_indexes()
+    filter_bits = [
+        volontaire_index.range_bits('age', age_range[0], age_range[1]),
+        volontaire_index.values_bits('arrondissement_de_residence', arrondissements),
+        volontaire_index.values_bits('genre', genre)
+    ]
+    if selected_conditions:
+        filter_bits.append(volontaire_index.any_bits(health_conditions_cols))
+    if dynamic_values:
+        filter_bits.append(volontaire_index.values_bits(dynamic_column, dynamic_values))
+    df_volontaire_filtered = compact_categories(df_volontaire[volontaire_index.combine(*filter_bits)])
+    if len(period) == 2:
+        # Jour de fin inclus : dates strictement avant le lendemain
+        period_bits = dates_index.range_bits('date_de_remplissage_de_la_fiche', period[0], period[1] + timedelta(days=1), include_high=False)
+        df_dates_filtered = df_dates[dates_index.combine(period_bits)]
+    else:
+        df_dates_filtered = df_dates
+
+    df_merged_filtered = df_volontaire_filtered.merge(df_dates_filtered, left_index=True, right_index=True, how='left')
+    return df_volontaire_filtered, df_dates_filtered, df_merged_filtered
+
+# Nombre d'images du réseau des arrondissements gardées en cache
+NETWORK_GRAPH_CACHE_MAX = 32
+
+# Réseau des arrondissements rendu une seule fois en PNG par jeu de comptes (arrondissement, nombre)
+@st.cache_resource(max_entries=NETWORK_GRAPH_CACHE_MAX)
+def render_network_graph(counts):
+    import networkx as nx
+    import matplotlib.pyplot as plt
+    with timed("rendu réseau arrondissements"):
+        G = nx.Graph()
+        for arr, count in counts:
+            G.add_node(arr, size=count * 10)
+        for i in range(len(counts) - 1):
+            G.add_edge(counts[i][0], counts[i + 1][0])
+        pos = nx.circular_layout(G)
+        fig, ax = plt.subplots()
+        try:
+            nx.draw(G, pos, with_labels=True, node_size=[G.nodes[node]['size'] for node in G.nodes()], node_color="#4CAF50", edge_color="gray", font_size=10, ax=ax)
+            buf = BytesIO()
+            fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+        finally:
+            plt.close(fig)
+        return buf.getvalue()
+
 # Dictionnaire de traductions
 translations = {
     "fr": {
@@ -85,6 +201,18 @@ translations = {
             **Pour :** INDABAX CAMEROON
         """,
         "qr_caption": "Scannez pour une version mobile",
+        "render_profiling": "Profilage du rendu",
+        "render_profiling_help": "Mesure la préparation, la construction des figures et l'émission vers le navigateur du module affiché",
+        "render_profile_title": "⏱️ Profil de rendu",
+        "render_profile_empty": "Aucun rendu mesuré pour ce module.",
+        "render_total": "Total",
+        "render_preparation": "Préparation",
+        "render_figures": "Figures",
+        "render_emission": "Émission",
+        "render_payload": "Charge envoyée",
+        "render_timings": "Temps cumulés du processus",
+        "preload_title": "Préchargement des données",
+        "preload_summary": "Attente au démarrage : {:.0f} ms (séquentiel : {:.0f} ms). En arrière-plan : {}.",
         "modules": {
             "📍 Cartographie des Donneurs": "📍 Cartographie des Donneurs",
             "🏥 Conditions de Santé": "🏥 Conditions de Santé",
@@ -149,6 +277,18 @@ translations = {
             **For:** INDABAX CAMEROON
         """,
         "qr_caption": "Scan for mobile version",
+        "render_profiling": "Render profiling",
+        "render_profiling_help": "Measures data preparation, figure building and browser emission for the displayed module",
+        "render_profile_title": "⏱️ Render Profile",
+        "render_profile_empty": "No render measured for this module yet.",
+        "render_total": "Total",
+        "render_preparation": "Preparation",
+        "render_figures": "Figures",
+        "render_emission": "Emission",
+        "render_payload": "Payload sent",
+        "render_timings": "Process-wide timings",
+        "preload_title": "Data preloading",
+        "preload_summary": "Startup wait: {:.0f} ms (sequential: {:.0f} ms). In the background: {}.",
         "modules": {
             "📍 Cartographie des Donneurs": "📍 Donor Mapping",
             "🏥 Conditions de Santé": "🏥 Health Conditions",
@@ -166,26 +306,7 @@ translations = {
 
 # Fonction pour appliquer le thème
 def set_theme(theme):
-    if theme == "Dark":
-        st.markdown("""
-            <style>
-            .main {background-color: #1e1e1e; color: #ffffff;}
-            .sidebar .sidebar-content {background-color: #2b2b2b; color: #ffffff;}
-            .stButton>button {background-color: #4CAF50; color: white; border-radius: 5px; transition: all 0.3s;}
-            .stButton>button:hover {background-color: #45a049;}
-            .stat-box {background-color: #333333; color: #ffffff; padding: 15px; border-radius: 10px; margin: 10px; text-align: center;}
-            </style>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown("""
-            <style>
-            .main {background-color: #ffffff; color: #000000;}
-            .sidebar .sidebar-content {background-color: #f0f2f6; color: #000000;}
-            .stButton>button {background-color: #4CAF50; color: white; border-radius: 5px; transition: all 0.3s;}
-            .stButton>button:hover {background-color: #45a049;}
-            .stat-box {background-color: #e8f5e9; color: #000000; padding: 15px; border-radius: 10px; margin: 10px; text-align: center;}
-            </style>
-        """, unsafe_allow_html=True)
+    st.markdown(theme_css(theme), unsafe_allow_html=True)
 
 # Fonction de connexion
 def show_login():
@@ -315,24 +436,21 @@ def show_dashboard():
         st.markdown("---")
         st.header(translations[lang]["navigation"])
         modules = {
-            "📍 Cartographie des Donneurs": lambda df: show_cartographie(df, lang),
-            "🏥 Conditions de Santé": lambda df: show_conditions(df, lang),
-            "🔬 Profilage des Donneurs": lambda df: show_profilage(df, lang),
-            "📅 Analyse des Campagnes": lambda df: show_campagnes(df, lang),
-            "🤝 Fidélisation des Donneurs": lambda df: show_fidelisation(df, lang),
-            "💬 Analyse de Sentiment": lambda df: show_sentiment(df, lang),
-            "🤖 Prédiction d’Éligibilité": lambda df: show_prediction(df, lang),
-            "🩸 Banque de Sang": lambda df: show_banque_sang(df, lang),
-            "📉 Prédictions des Besoins": lambda df: show_blood_demand_prediction(df, lang)
+            module_key: (lambda df, module_key=module_key: run_module(module_key, df, lang, render_profiling))
+            for module_key in MODULE_ENTRY_POINTS if module_key != "📊 Visualisation des Données"
         }
         # Ajouter le module "Visualisation des Données" uniquement si l'utilisateur est admin
         if st.session_state.get("is_admin", False):
-            modules["📊 Visualisation des Données"] = lambda df: show_visualization(df, lang)
+            modules["📊 Visualisation des Données"] = lambda df: run_module("📊 Visualisation des Données", df, lang, render_profiling)
 
         for module_key, module_func in modules.items():
             if st.button(translations[lang]["modules"][module_key], key=module_key, use_container_width=True):
                 st.session_state.selected_module = module_key
 
+        # Profilage du rendu des modules (administrateurs uniquement)
+        render_profiling = st.session_state.get("is_admin", False) and st.toggle(
+            translations[lang]["render_profiling"], key="render_profiling", help=translations[lang]["render_profiling_help"])
+
     with st.sidebar:
         st.header(translations[lang]["filters_info"])
         age_range = st.slider(translations[lang]["age"], 18, 65, (18, 65))
@@ -358,25 +476,17 @@ def show_dashboard():
         if not dynamic_values:
             st.info(translations[lang]["no_values_info"].format(dynamic_column=dynamic_column))
 
-    df_volontaire_filtered = df_volontaire[
-        (df_volontaire['age'].between(age_range[0], age_range[1])) &
-        (df_volontaire['arrondissement_de_residence'].isin(arrondissements)) &
-        (df_volontaire['genre'].isin(genre))
-    ]
-    if selected_conditions:
-        condition_filter = df_volontaire_filtered[health_conditions_cols].eq('Oui').any(axis=1)
-        df_volontaire_filtered = df_volontaire_filtered[condition_filter]
-    if dynamic_values:
-        df_volontaire_filtered = df_volontaire_filtered[df_volontaire_filtered[dynamic_column].isin(dynamic_values)]
-    if len(period) == 2:
-        df_dates_filtered = df_dates[
-            (df_dates['date_de_remplissage_de_la_fiche'].dt.date >= period[0]) &
-            (df_dates['date_de_remplissage_de_la_fiche'].dt.date <= period[1])
-        ]
-    else:
-        df_dates_filtered = df_dates
-
-    df_merged_filtered = df_volontaire_filtered.merge(df_dates_filtered, left_index=True, right_index=True, how='left')
+    # État des filtres normalisé (listes triées) : même sélection dans un autre ordre, même vue
+    filter_state = (
+        tuple(age_range),
+        tuple(sorted(arrondissements)),
+        tuple(sorted(genre)),
+        tuple(sorted(selected_conditions)),
+        dynamic_column if dynamic_values else None,
+        tuple(sorted(dynamic_values)),
+        tuple(period)
+    )
+    df_volontaire_filtered, df_dates_filtered, df_merged_filtered = filtered_views(filter_state)
 
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -392,6 +502,8 @@ def show_dashboard():
             st.session_state.selected_module = "📍 Cartographie des Donneurs"
         data_to_pass = df_volontaire_filtered if st.session_state.selected_module != "📅 Analyse des Campagnes" else df_merged_filtered
         modules[st.session_state.selected_module](data_to_pass)
+        if render_profiling:
+            show_render_profile(st.session_state.selected_module, lang)
 
     with col2:
         st.subheader(translations[lang]["top_arrondissements"])
@@ -414,15 +526,7 @@ def show_dashboard():
         )
 
         st.subheader(translations[lang]["network_arrondissements"])
-        G = nx.Graph()
-        for arr, count in top_arrondissements.itertuples(index=False):
-            G.add_node(arr, size=count * 10)
-        for i in range(len(top_arrondissements) - 1):
-            G.add_edge(top_arrondissements[translations[lang]["arrondissement_col"]][i], top_arrondissements[translations[lang]["arrondissement_col"]][i+1])
-        pos = nx.circular_layout(G)
-        fig, ax = plt.subplots()
-        nx.draw(G, pos, with_labels=True, node_size=[G.nodes[node]['size'] for node in G.nodes()], node_color="#4CAF50", edge_color="gray", font_size=10, ax=ax)
-        st.pyplot(fig)
+        st.image(render_network_graph(tuple(top_arrondissements.itertuples(index=False, name=None))))
 
         st.header(translations[lang]["details"])
         st.write(f"{translations[lang]['volunteers_filtered']}: {len(df_volontaire_filtered)}")
@@ -435,13 +539,7 @@ def show_dashboard():
         with st.expander(translations[lang]["about_dashboard"]):
             st.write(translations[lang]["about_text"])
 
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data("https://qganalytics-blood-dashboard-indabax.streamlit.app/")
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="#4CAF50", back_color="white")
-        buf = BytesIO()
-        qr_img.save(buf, format="PNG")
-        st.image(buf.getvalue(), caption=translations[lang]["qr_caption"])
+        st.image(qr_code_png(), caption=translations[lang]["qr_caption"])
 
 if __name__ == "__main__":
     if 'logged_in' not in st.session_state:
@@ -0,0 +1,291 @@
+# data_store.py
+# Accès unique aux jeux de données du tableau de bord : lus une seule fois depuis le disque
+# (APPLICATION/datas/ ou le dossier indiqué par QG_DATA_DIR) et partagés par tous les modules.
+#
+# Les CSV sont typés (catégories, dates, entiers compacts) puis gardés en instantanés Arrow
+# (datas/snapshots/*.feather) relus en mmap sans ré-analyse. Construction et mesures :
+#   python data_store.py build
+# preload_all() charge toutes les sources (CSV, GeoJSON, base SQLite) en parallèle au démarrage ;
+# seules les sources locales sont attendues, le GeoJSON (téléchargement possible) l'est en arrière-plan.
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import pandas as pd
+from notifications import DB_PATH as USERS_DB_PATH
+from instrumentation import record
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # sans pyarrow : lecture CSV typée à chaque démarrage
+    feather = None
+
+# Dossier local des données (par défaut les fichiers livrés avec l'application)
+DATA_DIR = os.environ.get('QG_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datas'))
+SNAPSHOT_DIR = os.environ.get('QG_SNAPSHOT_DIR', os.path.join(DATA_DIR, 'snapshots'))
+SNAPSHOTS_ENABLED = os.environ.get('QG_SNAPSHOTS', '1') == '1'
+
+# Secours si un fichier manque localement (désactivable avec QG_DATA_REMOTE=0)
+REMOTE_BASE_URL = 'https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas'
+REMOTE_FALLBACK = os.environ.get('QG_DATA_REMOTE', '1') == '1'
+
+# Contour des arrondissements de Douala : copie locale (QG_GEOJSON_PATH), téléchargée une fois si absente
+GEOJSON_URL = 'https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/map/douala_arrondissements.geojson'
+GEOJSON_PATH = os.environ.get('QG_GEOJSON_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'map', 'douala_arrondissements.geojson'))
+
+DATASETS = {
+    'volontaire': 'volontaire_clean_corrige.csv',
+    '2020': '2020_clean.csv',
+    'dates_2019': 'dates_2019_extraites.csv'
+}
+
+# Colonnes converties une fois pour toutes en datetime
+DATE_COLUMNS = {
+    '2020': ['horodateur'],
+    'dates_2019': ['date_de_remplissage_de_la_fiche']
+}
+
+# Une colonne texte devient catégorielle si elle a au plus ce ratio de valeurs distinctes
+CATEGORY_MAX_RATIO = 0.5
+
+# Schéma déclaré des volontaires : ces colonnes sont toujours catégorielles, quelle que soit
+# leur cardinalité (l'historique de plusieurs années garde ainsi les mêmes types)
+VOLONTAIRE_CATEGORIES = [
+    'niveau_detude', 'genre', 'situation_matrimoniale_sm', 'profession', 'arrondissement_de_residence',
+    'quartier_de_residence', 'nationalite', 'religion', 'a_til_elle_deja_donne_le_sang', 'eligibilite_au_don',
+    'autre_raisons_preciser', 'selectionner_ok_pour_envoyer'
+]
+# Indicateurs Oui/Non/Inconnu (raisons d'indisponibilité et de non-éligibilité) : catégories fixes
+FLAG_PREFIXES = ('raison_indisponibilite_', 'raison_de_lindisponibilite_de_la_femme_', 'raison_de_non_eligibilite_totale_')
+FLAG_CATEGORIES = ['Inconnu', 'Non', 'Oui']
+SCHEMAS = {'volontaire': {'categories': VOLONTAIRE_CATEGORIES, 'flag_prefixes': FLAG_PREFIXES}}
+
+# À incrémenter quand le typage change : les anciens instantanés sont alors ignorés
+SNAPSHOT_VERSION = 2
+
+def dataset_path(name):
+    if name not in DATASETS:
+        raise KeyError(f"Jeu de données inconnu : {name}")
+    return os.path.join(DATA_DIR, DATASETS[name])
+
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{os.path.splitext(DATASETS[name])[0]}.v{SNAPSHOT_VERSION}.feather")
+
+# Types compacts : dates, catégories pour les textes répétitifs, entiers sur 32 bits.
+# Les réels restent en float64 pour ne pas changer les valeurs affichées. Les catégories sont
+# ordonnées dans l'ordre alphabétique : tri, min/max (utilisés par plotly) se comportent comme sur du texte.
+def ordered_categories(s, categories=()):
+    return pd.CategoricalDtype(sorted(set(categories) | set(s.dropna().unique())), ordered=True)
+
+def typed_frame(name, df):
+    dates = DATE_COLUMNS.get(name, [])
+    schema = SCHEMAS.get(name, {})
+    declared = set(schema.get('categories', []))
+    flag_prefixes = schema.get('flag_prefixes', ())
+    for col in df.columns:
+        s = df[col]
+        if col in dates:
+            df[col] = pd.to_datetime(s)
+        elif flag_prefixes and col.startswith(flag_prefixes):
+            df[col] = s.astype(ordered_categories(s, FLAG_CATEGORIES))
+        elif col in declared:
+            df[col] = s.astype(ordered_categories(s))
+        elif pd.api.types.is_integer_dtype(s):
+            if len(s) == 0 or (s.min() >= -2**31 and s.max() < 2**31):
+                df[col] = s.astype('int32')
+        elif (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)) and s.nunique() <= CATEGORY_MAX_RATIO * len(s):
+            df[col] = s.astype(ordered_categories(s))
+    return df
+
+def read_csv_typed(name):
+    path = dataset_path(name)
+    if not os.path.exists(path):
+        if not REMOTE_FALLBACK:
+            raise FileNotFoundError(f"{path} introuvable (définir QG_DATA_DIR ou QG_DATA_REMOTE=1)")
+        path = f"{REMOTE_BASE_URL}/{DATASETS[name]}"
+    return typed_frame(name, pd.read_csv(path))
+
+# Un instantané est valable s'il est plus récent que le CSV dont il provient
+def snapshot_is_fresh(name):
+    snapshot, source = snapshot_path(name), dataset_path(name)
+    return os.path.exists(snapshot) and (not os.path.exists(source) or os.path.getmtime(snapshot) >= os.path.getmtime(source))
+
+def read_snapshot(name):
+    return feather.read_table(snapshot_path(name), memory_map=True).to_pandas()
+
+# Écriture atomique : un lecteur concurrent voit l'ancien fichier ou le nouveau, jamais un fichier partiel
+def write_snapshot(name, df):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(df, tmp, compression='uncompressed')
+    os.replace(tmp, path)
+
+# Un seul DataFrame en mémoire par jeu de données (cache_resource : pas de copie par appel).
+# Ne pas le modifier en place : travailler sur une copie (.copy(), .assign(), filtres...).
+@st.cache_resource(show_spinner=False)
+def load_dataset(name):
+    if feather is None or not SNAPSHOTS_ENABLED:
+        return read_csv_typed(name)
+    if snapshot_is_fresh(name):
+        return read_snapshot(name)
+    df = read_csv_typed(name)
+    try:
+        write_snapshot(name, df)
+    except OSError:
+        pass  # dossier en lecture seule : on restera sur le CSV
+    return df
+
+# GeoJSON lu depuis le disque ; à défaut, téléchargé puis enregistré pour les démarrages suivants
+@st.cache_resource(show_spinner=False)
+def load_geojson():
+    if os.path.exists(GEOJSON_PATH) or not REMOTE_FALLBACK:
+        with open(GEOJSON_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    import requests
+    response = requests.get(GEOJSON_URL, timeout=30)
+    response.raise_for_status()  # Lève une exception si la requête échoue
+    geojson_data = json.loads(response.text)
+    try:
+        os.makedirs(os.path.dirname(GEOJSON_PATH), exist_ok=True)
+        tmp = f"{GEOJSON_PATH}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        os.replace(tmp, GEOJSON_PATH)
+    except OSError:
+        pass  # dossier en lecture seule : nouveau téléchargement au prochain démarrage
+    return geojson_data
+
+# Signature de la base des utilisateurs : elle change à chaque écriture
+def users_signature():
+    try:
+        stat = os.stat(USERS_DB_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+# Table users partagée, relue seulement quand la base a changé. Ne pas la modifier en place.
+@st.cache_resource(max_entries=1, show_spinner=False)
+def read_users(signature):
+    if signature is None:
+        raise FileNotFoundError(f"{USERS_DB_PATH} introuvable")
+    conn = sqlite3.connect(USERS_DB_PATH)
+    try:
+        return pd.read_sql_query("SELECT * FROM users ORDER BY timestamp DESC", conn)
+    finally:
+        conn.close()
+
+def load_users():
+    return read_users(users_signature())
+
+# Sources préchargées au démarrage, chacune publiée dans son cache
+PRELOAD_SOURCES = {
+    'volontaire': lambda: load_dataset('volontaire'),
+    '2020': lambda: load_dataset('2020'),
+    'dates_2019': lambda: load_dataset('dates_2019'),
+    'geojson': load_geojson,
+    'users': load_users
+}
+
+# Sources chargées en arrière-plan sans bloquer la première page (GeoJSON : téléchargement jusqu'à 30 s)
+BACKGROUND_SOURCES = ('geojson',)
+
+def timed_preload(name, loader):
+    start = time.perf_counter()
+    error = None
+    try:
+        loader()
+    except Exception as e:  # une source en échec n'empêche pas les autres ; elle sera rechargée à la demande
+        error = str(e)
+    seconds = time.perf_counter() - start
+    record(f"préchargement {name}", seconds)
+    return name, {"seconds": seconds, "error": error}
+
+# Chargement concurrent de toutes les sources : la première page attend la plus lente des sources
+# locales, pas la somme. Les sources d'arrière-plan s'ajoutent au rapport (partagé) une fois chargées.
+@st.cache_resource(show_spinner=False)
+def preload_all():
+    ctx = get_script_run_ctx()
+
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    report = {"sources": {}, "background": list(BACKGROUND_SOURCES)}
+
+    def preload_in_background(name, loader):
+        attach_ctx()
+        report["sources"].update([timed_preload(name, loader)])
+
+    for name in BACKGROUND_SOURCES:
+        threading.Thread(target=preload_in_background, args=(name, PRELOAD_SOURCES[name]), daemon=True).start()
+
+    blocking = [item for item in PRELOAD_SOURCES.items() if item[0] not in BACKGROUND_SOURCES]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(blocking), initializer=attach_ctx) as pool:
+        sources = dict(pool.map(lambda item: timed_preload(*item), blocking))
+    wall = time.perf_counter() - start
+    record("préchargement total", wall)
+    report["sources"].update(sources)
+    report.update(wall_s=wall, sequential_s=sum(source["seconds"] for source in sources.values()))
+    return report
+
+# Après un filtrage, retirer les catégories devenues vides (sinon value_counts les compte à 0)
+def compact_categories(df):
+    cols = df.select_dtypes('category').columns
+    if len(cols) == 0:
+        return df
+    return df.assign(**{col: df[col].cat.remove_unused_categories() for col in cols})
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+# Meilleur temps sur quelques essais (le premier paie les imports et l'initialisation de pyarrow)
+def best_time(load, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+# Construit tous les instantanés et compare temps de chargement et mémoire avec la lecture CSV
+def build_snapshots():
+    if feather is None:
+        raise RuntimeError("pyarrow est requis pour construire les instantanés.")
+    report = {}
+    for name in DATASETS:
+        # Chemin CSV d'origine : lecture puis conversion des dates dans les modules
+        def load_csv():
+            df = pd.read_csv(dataset_path(name))
+            for col in DATE_COLUMNS.get(name, []):
+                df[col] = pd.to_datetime(df[col])
+            return df
+        csv_seconds, raw = best_time(load_csv)
+        write_snapshot(name, typed_frame(name, pd.read_csv(dataset_path(name))))
+        snapshot_seconds, loaded = best_time(lambda: read_snapshot(name))
+        report[name] = {
+            "rows": len(loaded),
+            "csv_load_s": csv_seconds,
+            "snapshot_load_s": snapshot_seconds,
+            "csv_memory_mb": memory_mb(raw),
+            "snapshot_memory_mb": memory_mb(loaded),
+            "snapshot_file_mb": os.path.getsize(snapshot_path(name)) / 1e6
+        }
+    with open(os.path.join(SNAPSHOT_DIR, 'manifest.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['build']:
+        for name, stats in build_snapshots().items():
+            print(f"{name:12s} CSV {stats['csv_load_s'] * 1000:7.1f} ms {stats['csv_memory_mb']:6.2f} Mo | "
+                  f"instantané {stats['snapshot_load_s'] * 1000:7.1f} ms {stats['snapshot_memory_mb']:6.2f} Mo")
+    else:
+        print("Usage : python data_store.py build")
@@ -0,0 +1,137 @@
+# disk_cache.py
+# Cache disque des résultats dérivés coûteux (sentiments, clusters, correspondances de noms,
+# prévisions Prophet, tableaux croisés) : il survit aux redémarrages de Streamlit.
+# La clé est une empreinte du contenu des entrées (DataFrame compris) et des paramètres ;
+# au-delà de QG_DISK_CACHE_MAX_MB, les entrées les moins récemment utilisées sont supprimées.
+import os
+import pickle
+import hashlib
+import functools
+import time
+import numpy as np
+import pandas as pd
+from instrumentation import record
+
+CACHE_DIR = os.environ.get('QG_DISK_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache'))
+CACHE_MAX_MB = float(os.environ.get('QG_DISK_CACHE_MAX_MB', '256'))
+CACHE_ENABLED = os.environ.get('QG_DISK_CACHE', '1') == '1'
+
+MISS = object()
+STATS = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+# Empreinte d'une valeur : contenu des DataFrame/Series/tableaux, repr pour les paramètres simples
+def update_hash(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(b'DataFrame')
+        h.update(repr([(str(col), str(dtype)) for col, dtype in value.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        h.update(b'Series')
+        h.update(repr((value.name, str(value.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((str(value.dtype), value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(b'(')
+        for item in value:
+            update_hash(h, item)
+        h.update(b')')
+    elif isinstance(value, dict):
+        update_hash(h, sorted(value.items(), key=lambda item: repr(item[0])))
+    else:
+        h.update(repr(value).encode())
+        h.update(b'|')
+
+def content_key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        update_hash(h, part)
+    return h.hexdigest()
+
+def entry_path(namespace, key):
+    return os.path.join(CACHE_DIR, namespace, f"{key}.pkl")
+
+def get(namespace, key):
+    path = entry_path(namespace, key)
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+    except FileNotFoundError:
+        return MISS
+    except Exception:  # entrée corrompue ou illisible : on la supprime et on recalcule
+        STATS["errors"] += 1
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return MISS
+    # Date de modification = dernière utilisation (ordre d'éviction)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+# Écriture atomique puis éviction LRU si le cache dépasse sa taille maximale
+def put(namespace, key, value):
+    path = entry_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        STATS["writes"] += 1
+    except OSError:  # dossier en lecture seule : le résultat reste simplement non mis en cache
+        STATS["errors"] += 1
+        return
+    evict()
+
+def evict(max_bytes=None):
+    max_bytes = CACHE_MAX_MB * 1e6 if max_bytes is None else max_bytes
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith('.pkl'):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            STATS["evictions"] += 1
+        except OSError:
+            pass
+
+def clear():
+    evict(max_bytes=0)
+
+# Décorateur : résultat lu sur disque si les mêmes entrées ont déjà été calculées.
+# Incrémenter version quand le calcul change pour ignorer les anciens résultats.
+def disk_cached(namespace, version=1):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+            key = content_key(namespace, version, func.__qualname__, args, kwargs)
+            value = get(namespace, key)
+            if value is not MISS:
+                STATS["hits"] += 1
+                return value
+            STATS["misses"] += 1
+            start = time.perf_counter()
+            value = func(*args, **kwargs)
+            record(f"calcul {namespace}", time.perf_counter() - start)
+            put(namespace, key, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+# filter_index.py
+# Index de filtrage construit une fois au chargement des données : un ensemble de bits compacté
+# (np.packbits) par valeur de chaque colonne catégorielle, et un tableau trié pour les intervalles
+# (âge, dates). Toute combinaison de filtres se résout par des ET/OU de bits, sans rebalayer le DataFrame.
+import numpy as np
+import pandas as pd
+
+class FilterIndex:
+    def __init__(self, df, range_columns=(), max_cardinality=256):
+        self.df = df
+        self.n = len(df)
+        # Bits par valeur pour les colonnes catégorielles de faible cardinalité
+        self.bitsets = {}
+        for col in df.columns:
+            s = df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype) and len(s.cat.categories) <= max_cardinality:
+                codes = s.array.codes
+                self.bitsets[col] = {
+                    value: np.packbits(codes == code) for code, value in enumerate(s.cat.categories)
+                }
+        # Valeurs triées (et positions d'origine) pour les filtres par intervalle
+        self.ranges = {}
+        for col in range_columns:
+            keys = self._range_keys(df[col])
+            order = np.argsort(keys, kind='stable')
+            self.ranges[col] = (keys[order], order)
+        self.all_bits = np.packbits(np.ones(self.n, dtype=bool))
+
+    @staticmethod
+    def _range_keys(s):
+        if pd.api.types.is_datetime64_any_dtype(s):
+            return s.to_numpy().astype('datetime64[ns]').view('int64')
+        return s.to_numpy()
+
+    @staticmethod
+    def _range_bound(s_dtype, value):
+        if pd.api.types.is_datetime64_any_dtype(s_dtype):
+            return pd.Timestamp(value).value
+        return value
+
+    def pack(self, mask):
+        return np.packbits(np.asarray(mask, dtype=bool))
+
+    # OU des valeurs demandées ; colonne non indexée : isin classique
+    def values_bits(self, col, values):
+        table = self.bitsets.get(col)
+        if table is None:
+            return self.pack(self.df[col].isin(values))
+        bits = np.zeros_like(self.all_bits)
+        for value in values:
+            value_bits = table.get(value)
+            if value_bits is not None:
+                bits |= value_bits
+        return bits
+
+    # Lignes dont la valeur est dans [low, high] (ou [low, high[ si include_high=False)
+    def range_bits(self, col, low, high, include_high=True):
+        keys, order = self.ranges[col]
+        dtype = self.df[col].dtype
+        start = np.searchsorted(keys, self._range_bound(dtype, low), side='left')
+        stop = np.searchsorted(keys, self._range_bound(dtype, high), side='right' if include_high else 'left')
+        mask = np.zeros(self.n, dtype=bool)
+        mask[order[start:stop]] = True
+        return self.pack(mask)
+
+    # Lignes où au moins une des colonnes vaut value
+    def any_bits(self, cols, value='Oui'):
+        bits = np.zeros_like(self.all_bits)
+        for col in cols:
+            bits |= self.values_bits(col, [value])
+        return bits
+
+    # ET de plusieurs ensembles de bits, renvoyé en masque booléen aligné sur le DataFrame
+    def combine(self, *bitsets):
+        bits = self.all_bits.copy()
+        for b in bitsets:
+            bits &= b
+        return np.unpackbits(bits, count=self.n).astype(bool)
@@ -0,0 +1,251 @@
+# geo_store.py
+# Couches géographiques de la cartographie, construites une fois par processus à partir du GeoJSON
+# local (data_store.load_geojson) : arrondissements (admin_level 8) et quartiers (place suburb).
+# Chaque couche est gardée en pleine résolution et simplifiée (Douglas-Peucker) pour plusieurs
+# niveaux de zoom : les cartes Folium n'envoient que les sommets visibles à leur échelle.
+# Un index par nom (centroïde, emprise, surface) place les marqueurs sans parcourir les géométries.
+# grid_cells agrège des points sur une grille à l'échelle d'un zoom (cellules agrandies au besoin pour en borner le nombre).
+import numpy as np
+import pandas as pd
+import streamlit as st
+from data_store import load_geojson
+from instrumentation import timed
+
+LAYERS = {
+    'arrondissements': lambda props: props.get('admin_level') == "8",
+    'quartiers': lambda props: props.get('place') == "suburb"
+}
+
+# Niveaux de zoom préparés ; tolérance = taille d'un pixel (en degrés) à ce zoom
+ZOOM_LEVELS = (10, 11, 12, 13, 14)
+COORD_DECIMALS = 5  # ~1 m, bien en dessous de la plus fine tolérance
+
+# Agrégation en grille : côté des cellules en pixels à l'écran (doublé tant que la grille dépasse
+# le nombre maximal de cellules envoyées)
+GRID_CELL_PX = 32
+MAX_GRID_CELLS = 400
+
+# Centre de Douala, position des éléments sans géométrie exploitable
+DEFAULT_CENTER = [4.0511, 9.7679]
+KM_PER_DEGREE = 111.32
+
+def zoom_tolerance(zoom):
+    return 360.0 / (256 * 2 ** zoom)
+
+# Douglas-Peucker itératif sur un tableau (n, 2) : masque des sommets conservés
+def simplify_line(points, tolerance):
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        inner = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+def simplify_points(coords, tolerance):
+    points = np.asarray(coords, dtype=float)[:, :2]
+    return points, points[simplify_line(points, tolerance)]
+
+def simplify_path(coords, tolerance):
+    _, simplified = simplify_points(coords, tolerance)
+    return np.round(simplified, COORD_DECIMALS).tolist()
+
+# Anneau fermé : au moins 4 sommets, sinon l'anneau d'origine est gardé
+def simplify_ring(ring, tolerance):
+    points, simplified = simplify_points(ring, tolerance)
+    if len(simplified) < 4:
+        simplified = points
+    return np.round(simplified, COORD_DECIMALS).tolist()
+
+def simplify_geometry(geometry, tolerance):
+    if not geometry:
+        return geometry
+    kind = geometry.get('type')
+    coords = geometry.get('coordinates')
+    if kind == 'Polygon':
+        coords = [simplify_ring(ring, tolerance) for ring in coords]
+    elif kind == 'MultiPolygon':
+        coords = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in coords]
+    elif kind == 'LineString':
+        coords = simplify_path(coords, tolerance)
+    elif kind == 'MultiLineString':
+        coords = [simplify_path(line, tolerance) for line in coords]
+    else:  # Point, MultiPoint, GeometryCollection : inchangés
+        return geometry
+    return {'type': kind, 'coordinates': coords}
+
+def count_vertices(coords):
+    if not coords:
+        return 0
+    if isinstance(coords[0], (int, float)):
+        return 1
+    return sum(count_vertices(c) for c in coords)
+
+def layer_vertices(layer):
+    return sum(count_vertices((f.get('geometry') or {}).get('coordinates')) for f in layer['features'])
+
+# Polygones d'une géométrie, chacun en liste d'anneaux (extérieur puis trous)
+def geometry_polygons(geometry):
+    kind = geometry.get('type')
+    if kind == 'Polygon':
+        return [geometry['coordinates']]
+    if kind == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def geometry_points(coords):
+    points = []
+    def flatten(c):
+        if len(c) > 0 and isinstance(c[0], (int, float)):
+            points.append(c[:2])
+        else:
+            for sub in c:
+                flatten(sub)
+    flatten(coords)
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+# Aire signée (degrés²) et centroïde d'un anneau par la formule du lacet
+def ring_area_centroid(ring):
+    points = np.asarray(ring, dtype=float)[:, :2]
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    cross = x0 * y1 - x1 * y0
+    area = cross.sum() / 2
+    if area == 0:
+        return 0.0, points.mean(axis=0)
+    return area, np.array([((x0 + x1) * cross).sum(), ((y0 + y1) * cross).sum()]) / (6 * area)
+
+# Centroïde [lat, lon] pondéré par la surface (trous déduits), emprise et surface en km².
+# Points et lignes : moyenne des sommets, surface nulle.
+def feature_geometry_summary(geometry):
+    points = geometry_points((geometry or {}).get('coordinates') or [])
+    if len(points) == 0:
+        return {"centroid": list(DEFAULT_CENTER), "bbox": None, "area_km2": 0.0}
+    total_area, weighted = 0.0, np.zeros(2)
+    for polygon in geometry_polygons(geometry):
+        for position, ring in enumerate(polygon):
+            if len(ring) < 3:
+                continue
+            area, centroid = ring_area_centroid(ring)
+            area = abs(area) if position == 0 else -abs(area)
+            total_area += area
+            weighted += area * centroid
+    lon, lat = weighted / total_area if total_area > 0 else points.mean(axis=0)
+    min_lon, min_lat = points.min(axis=0)
+    max_lon, max_lat = points.max(axis=0)
+    area_km2 = max(total_area, 0.0) * KM_PER_DEGREE ** 2 * np.cos(np.radians(lat))
+    return {
+        "centroid": [float(lat), float(lon)],
+        "bbox": [float(min_lat), float(min_lon), float(max_lat), float(max_lon)],
+        "area_km2": float(area_km2)
+    }
+
+# Index nom -> résumé géométrique (premier élément retenu si un nom est en double)
+def build_feature_index(features):
+    index = {}
+    for feature in features:
+        name = (feature.get('properties') or {}).get('name', 'Inconnu')
+        if name not in index:
+            index[name] = feature_geometry_summary(feature.get('geometry'))
+    return index
+
+# Couches complètes, simplifiées et indexées :
+# {couche: {'full': FeatureCollection, 'zooms': {zoom: FeatureCollection}, 'index': {nom: résumé}}}
+@st.cache_resource(show_spinner=False)
+def geo_layers():
+    geojson_data = load_geojson()
+    layers = {}
+    with timed("simplification GeoJSON"):
+        for name, selector in LAYERS.items():
+            features = [f for f in geojson_data['features'] if selector(f.get('properties') or {})]
+            zooms = {}
+            for zoom in ZOOM_LEVELS:
+                tolerance = zoom_tolerance(zoom)
+                zooms[zoom] = {'type': 'FeatureCollection', 'features': [
+                    {'type': 'Feature', 'properties': f.get('properties') or {},
+                     'geometry': simplify_geometry(f.get('geometry'), tolerance)}
+                    for f in features
+                ]}
+            layers[name] = {
+                'full': {'type': 'FeatureCollection', 'features': features},
+                'zooms': zooms,
+                'index': build_feature_index(features)
+            }
+    return layers
+
+# Couche au niveau préparé le plus proche du zoom demandé (zoom=None : pleine résolution).
+# Les objets renvoyés sont partagés : copier les propriétés avant de les modifier.
+def geo_layer(name, zoom=None):
+    layer = geo_layers()[name]
+    if zoom is None:
+        return layer['full']
+    zoom = min(ZOOM_LEVELS, key=lambda level: abs(level - zoom))
+    return layer['zooms'][zoom]
+
+# Centroïde, emprise et surface de chaque élément d'une couche, par nom
+def feature_index(name):
+    return geo_layers()[name]['index']
+
+# Sommets par couche et par niveau (suivi de la simplification)
+def vertex_report():
+    return {
+        name: {'full': layer_vertices(layer['full']), **{zoom: layer_vertices(fc) for zoom, fc in layer['zooms'].items()}}
+        for name, layer in geo_layers().items()
+    }
+
+# Comptage des points par cellule carrée (GRID_CELL_PX pixels au zoom donné). Au-delà de
+# max_cells cellules non vides, la taille des cellules est doublée jusqu'à tenir dans la limite :
+# chaque point reste compté. Une ligne par cellule non vide : bornes (sud, ouest, nord, est),
+# nombre de points, par nombre décroissant.
+def grid_cells(lat, lon, zoom, cell_px=GRID_CELL_PX, max_cells=MAX_GRID_CELLS):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid], lon[valid]
+    columns = ['south', 'west', 'north', 'east', 'count']
+    if len(lat) == 0:
+        return pd.DataFrame(columns=columns)
+    while True:
+        lon_size = zoom_tolerance(zoom) * cell_px
+        lat_size = lon_size * np.cos(np.radians(lat.mean()))  # cellules carrées à l'écran (Mercator)
+        rows = np.floor(lat / lat_size).astype(np.int64)
+        cols = np.floor(lon / lon_size).astype(np.int64)
+        # Clé entière unique par cellule (ligne, colonne) : un seul np.unique 1D
+        row0, col0 = rows.min(), cols.min()
+        width = cols.max() - col0 + 1
+        keys, counts = np.unique((rows - row0) * width + (cols - col0), return_counts=True)
+        if len(keys) <= max_cells:
+            break
+        cell_px *= 2
+    order = np.argsort(-counts, kind='stable')
+    keys, counts = keys[order], counts[order]
+    rows, cols = keys // width + row0, keys % width + col0
+    return pd.DataFrame({
+        'south': rows * lat_size,
+        'west': cols * lon_size,
+        'north': (rows + 1) * lat_size,
+        'east': (cols + 1) * lon_size,
+        'count': counts
+    }, columns=columns)
+
+if __name__ == "__main__":
+    for name, levels in vertex_report().items():
+        print(name, levels)
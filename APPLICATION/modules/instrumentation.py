@@ -0,0 +1,158 @@
+# instrumentation.py
+# Mesures de temps partagées par le tableau de bord (rendus, imports, chargements) :
+# les dernières durées de chaque opération sont gardées en mémoire et journalisées.
+import os
+import sys
+import json
+import time
+import logging
+import functools
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Journal sur la sortie d'erreur du serveur Streamlit ; niveau réglable par QG_LOG_LEVEL
+LOG_LEVEL = os.environ.get('QG_LOG_LEVEL', 'INFO').upper()
+
+logger = logging.getLogger('qg_dashboard')
+if not logger.handlers:  # module réimporté : ne pas doubler le gestionnaire
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+# Journal structuré des profils de rendu : une ligne JSON par rendu, sans préfixe, exploitable tel quel
+profile_logger = logging.getLogger('qg_dashboard.render_profile')
+if not profile_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    profile_logger.addHandler(handler)
+    profile_logger.propagate = False
+
+# Dernières mesures par opération (en secondes)
+TIMINGS = defaultdict(lambda: deque(maxlen=200))
+
+def record(name, seconds):
+    TIMINGS[name].append(seconds)
+    logger.info("%s : %.1f ms", name, seconds * 1000)
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+# Résumé par opération : nombre de mesures, dernière, moyenne et maximum (ms)
+def summary():
+    report = {}
+    for name, samples in list(TIMINGS.items()):
+        values = list(samples)
+        if values:
+            report[name] = {
+                "count": len(values),
+                "last_ms": values[-1] * 1000,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "max_ms": max(values) * 1000
+            }
+    return report
+
+# Profil de rendu des modules : durée de chaque show_*, décomposée en construction des figures
+# (px.*), émission vers le navigateur (st.plotly_chart, folium_static) et préparation des données
+# (le reste), avec la taille des charges envoyées si measure_payload est demandé.
+CURRENT_PROFILE = ContextVar('render_profile', default=None)
+PROFILES = {}
+
+# Taille (octets) de ce qu'envoie chaque fonction d'émission
+def plotly_payload(args, kwargs):
+    fig = args[0] if args else kwargs.get('figure_or_data')
+    return len(fig.to_json()) if hasattr(fig, 'to_json') else 0
+
+def folium_payload(args, kwargs):
+    fig = args[0] if args else kwargs.get('fig')
+    return len(fig.get_root().render()) if hasattr(fig, 'get_root') else 0
+
+def html_payload(args, kwargs):
+    html = args[0] if args else kwargs.get('html', '')
+    return len(html.encode('utf-8'))
+
+# Enveloppe une fonction de tracé : sans profil en cours, appel direct. Les appels imbriqués
+# (folium_static -> components.html) ne sont comptés qu'une fois, au niveau le plus externe.
+def profiled(func, kind, name, payload=None):
+    if getattr(func, 'render_profiled', False):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = CURRENT_PROFILE.get()
+        if profile is None or profile["depth"]:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        profile["depth"] += 1
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profile["depth"] -= 1
+        phase = {"kind": kind, "name": name, "ms": (time.perf_counter() - start) * 1000}
+        if payload is not None and profile["measure_payload"]:
+            try:
+                phase["bytes"] = payload(args, kwargs)
+            except Exception:
+                phase["bytes"] = 0
+            profile["payload_bytes"] += phase["bytes"]
+        profile["phases"].append(phase)
+        return result
+
+    wrapper.render_profiled = True
+    return wrapper
+
+# Installe les enveloppes sur plotly.express, st.plotly_chart, components.html et le
+# folium_static importé par le module
+def instrument_module(module):
+    import streamlit as st
+    import streamlit.components.v1 as components
+    st.plotly_chart = profiled(st.plotly_chart, "émission", "st.plotly_chart", plotly_payload)
+    components.html = profiled(components.html, "émission", "components.html", html_payload)
+    px = sys.modules.get('plotly.express')
+    if px is not None:
+        for attr in dir(px):
+            func = getattr(px, attr)
+            if attr.islower() and callable(func) and not attr.startswith(('_', 'get_')):
+                setattr(px, attr, profiled(func, "figure", f"px.{attr}"))
+    if hasattr(module, 'folium_static'):
+        module.folium_static = profiled(module.folium_static, "émission", "folium_static", folium_payload)
+    return module
+
+@contextmanager
+def render_profile(name, measure_payload=False):
+    profile = {"module": name, "phases": [], "payload_bytes": 0, "measure_payload": measure_payload, "depth": 0}
+    token = CURRENT_PROFILE.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        CURRENT_PROFILE.reset(token)
+        total = time.perf_counter() - start
+        figure_ms = sum(p["ms"] for p in profile["phases"] if p["kind"] == "figure")
+        emission_ms = sum(p["ms"] for p in profile["phases"] if p["kind"] == "émission")
+        profile.update({
+            "total_ms": total * 1000,
+            "figure_ms": figure_ms,
+            "emission_ms": emission_ms,
+            "preparation_ms": max(total * 1000 - figure_ms - emission_ms, 0.0)
+        })
+        TIMINGS[f"rendu {name}"].append(total)
+        PROFILES[name] = profile
+        profile_logger.info(json.dumps({
+            "event": "render_profile",
+            "module": name,
+            "total_ms": round(profile["total_ms"], 1),
+            "preparation_ms": round(profile["preparation_ms"], 1),
+            "figure_ms": round(figure_ms, 1),
+            "emission_ms": round(emission_ms, 1),
+            "figures": sum(1 for p in profile["phases"] if p["kind"] == "figure"),
+            "emissions": sum(1 for p in profile["phases"] if p["kind"] == "émission"),
+            "payload_bytes": profile["payload_bytes"] if measure_payload else None
+        }, ensure_ascii=False))
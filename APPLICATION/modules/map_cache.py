@@ -0,0 +1,66 @@
+# map_cache.py
+# Cache du HTML des cartes Folium rendues. La clé est une empreinte des données affichées
+# (comptes par zone ou cellules, langue, options de couche) : une vue identique est renvoyée
+# telle quelle au navigateur, sans reconstruire ni resérialiser la carte. Taille bornée
+# (QG_MAP_HTML_CACHE_MB), les cartes les moins récemment affichées sont évincées en premier.
+import os
+import threading
+from collections import OrderedDict
+import folium
+import streamlit as st
+import streamlit.components.v1 as components
+from disk_cache import content_key
+from instrumentation import timed
+
+MAP_HTML_CACHE_MB = float(os.environ.get('QG_MAP_HTML_CACHE_MB', '32'))
+
+# Dimensions par défaut de folium_static
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+# HTML et hauteur d'affichage d'une carte, comme les produit folium_static
+def render_map_html(m, height=MAP_HEIGHT):
+    fig = folium.Figure().add_child(m) if isinstance(m, folium.Map) else m
+    return fig.render(), (fig.height or height) + 10
+
+class MapHtmlCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # (html, hauteur) en cache, ou construit par build() puis rendu et gardé
+    def get_or_render(self, key, build):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        with timed("rendu HTML carte"):
+            entry = render_map_html(build())
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = entry
+                self.size += len(entry[0])
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, (html, _) = self.entries.popitem(last=False)
+                self.size -= len(html)
+        return entry
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+@st.cache_resource
+def map_html_cache():
+    return MapHtmlCache(MAP_HTML_CACHE_MB * 1e6)
+
+# Affiche la carte décrite par key_parts ; build() n'est appelé qu'en absence du cache
+def show_cached_map(key_parts, build, width=MAP_WIDTH):
+    html, height = map_html_cache().get_or_render(content_key(*key_parts), build)
+    return components.html(html, height=height, width=width)
@@ -3,6 +3,7 @@ import plotly.express as px
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from data_store import load_dataset, compact_categories
 
 # Dictionnaire de traductions pour le module Banque de Sang
 translations = {
@@ -74,8 +75,7 @@ translations = {
 
 @st.cache_data
 def load_banque_sang():
-    df = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/2020_clean.csv')
-    df['horodateur'] = pd.to_datetime(df['horodateur'])
+    df = load_dataset('2020').copy()
     df['mois'] = df['horodateur'].dt.month_name()
     df['jour'] = df['horodateur'].dt.day
     df['heure'] = df['horodateur'].dt.hour
@@ -117,6 +117,7 @@ def show_banque_sang(df_unused=None, lang="fr"):
         (df_banque['age'].between(age_range[0], age_range[1])) &
         (df_banque['type_de_donation'].isin(type_de_donation))
     ]
+    df_filtered = compact_categories(df_filtered)
 
     # Section 1 : Analyse des Dons
     st.subheader(translations[lang]["analysis_subheader"])
@@ -1,12 +1,10 @@
 import streamlit as st
 from prophet import Prophet
 import pandas as pd
-import sqlite3
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-
-# Chemin de la base de données (déjà défini)
-DB_PATH = "blood_donation_users.db"
+from data_store import load_users
+from disk_cache import disk_cached
 
 # Traductions pour le module
 translations = {
@@ -44,13 +42,19 @@ translations = {
     }
 }
 
+# Prévision Prophet des dons journaliers sur `periods` jours, mise en cache sur disque
+@disk_cached('prophet')
+def forecast_donations(df_daily, periods):
+    model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=True)
+    model.fit(df_daily)
+    future = model.make_future_dataframe(periods=periods)
+    return model.predict(future)[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+
 def show_blood_demand_prediction(df_unused=None, lang="fr"):
     st.subheader(translations[lang]["title"])
 
     # Charger les données historiques
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT timestamp FROM users ORDER BY timestamp", conn)
-    conn.close()
+    df = load_users()[["timestamp"]].copy()
     df["timestamp"] = pd.to_datetime(df["timestamp"])
 
     # Agréger les dons par jour
@@ -61,13 +65,8 @@ def show_blood_demand_prediction(df_unused=None, lang="fr"):
         st.warning(translations[lang]["no_data"])
         return
 
-    # Configurer le modèle Prophet
-    model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=True)
-    model.fit(df_daily)
-
-    # Créer un dataframe pour les prédictions futures (30 jours par défaut)
-    future = model.make_future_dataframe(periods=30)
-    forecast = model.predict(future)
+    # Prédictions futures avec Prophet (30 jours par défaut)
+    forecast = forecast_donations(df_daily, 30)
 
     # Graphique interactif avec Plotly
     fig = go.Figure()
@@ -92,8 +91,7 @@ def show_blood_demand_prediction(df_unused=None, lang="fr"):
         min_value=7, max_value=90, value=30, step=7
     )
     if st.button(translations[lang]["update_button"]):
-        future = model.make_future_dataframe(periods=period)
-        forecast = model.predict(future)
+        forecast = forecast_donations(df_daily, period)
         fig.data[1].x = forecast["ds"]
         fig.data[1].y = forecast["yhat"]
         fig.data[2].x = forecast["ds"]
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from disk_cache import disk_cached
 
 # Dictionnaire de traductions pour le module Analyse des Campagnes
 translations = {
@@ -78,6 +79,13 @@ translations = {
     }
 }
 
+# Nombre de fiches par mois et tranche d'âge, mois dans l'ordre du calendrier
+@disk_cached('pivots')
+def month_age_pivot(df_month_age):
+    heatmap_data = df_month_age.groupby(['mois', 'age_group']).size().unstack(fill_value=0)
+    month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    return heatmap_data.reindex(month_order, fill_value=0)
+
 def show_campagnes(df_unused, lang="fr"):
     st.header(translations[lang]["header"])
 
@@ -114,9 +122,7 @@ def show_campagnes(df_unused, lang="fr"):
         col1, col2 = st.columns(2)
         with col1:
             st.markdown(translations[lang]["heatmap_title"])
-            heatmap_data = df.groupby(['mois', 'age_group']).size().unstack(fill_value=0)
-            month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-            heatmap_data = heatmap_data.reindex(month_order, fill_value=0)
+            heatmap_data = month_age_pivot(df[['mois', 'age_group']])
             fig1 = px.imshow(
                 heatmap_data, text_auto=True, color_continuous_scale='RdBu_r',
                 labels=dict(x=translations[lang]["heatmap_x"], y=translations[lang]["heatmap_y"], color=translations[lang]["heatmap_color"]),
@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
 import folium
-from streamlit_folium import folium_static
-import json
-from fuzzywuzzy import process
+import branca.colormap as cm
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
+from geo_store import geo_layers, geo_layer, feature_index, grid_cells, ZOOM_LEVELS
+from name_resolver import resolve_names
+from map_cache import show_cached_map
 
 # Dictionnaire de traductions pour le module Cartographie des Donneurs
 translations = {
@@ -32,7 +33,15 @@ translations = {
         "export_filename": "cartographie_donneurs.csv",
         "missing_cols_error": "❌ Colonnes manquantes : {}",
         "geojson_error": "Fichier GeoJSON non trouvé. Vérifie le chemin : 'map/douala_arrondissements.geojson'",
-        "no_quartier_data_warning": "Pas de données GeoJSON pour les quartiers, affichage limité."
+        "no_quartier_data_warning": "Pas de données GeoJSON pour les quartiers, affichage limité.",
+        "map_mode_label": "Affichage des cartes",
+        "map_mode_zones": "Par zone",
+        "map_mode_grid": "Grille agrégée",
+        "map_mode_help": "La grille regroupe les donneurs par cellule côté serveur : la carte envoyée reste légère quel que soit le nombre de donneurs.",
+        "grid_map_title": "##### Densité des Donneurs (grille)",
+        "grid_zoom_label": "Niveau de zoom",
+        "grid_legend": "Donneurs par cellule",
+        "grid_tooltip": "<p class='tooltip'>Carte : {} cellules, {} donneurs localisés, {} non localisés.</p>"
     },
     "en": {
         "header": "📍 Mapping of Donor Distribution",
@@ -56,28 +65,157 @@ translations = {
         "export_filename": "donor_mapping.csv",
         "missing_cols_error": "❌ Missing columns: {}",
         "geojson_error": "GeoJSON file not found. Check the path: 'map/douala_arrondissements.geojson'",
-        "no_quartier_data_warning": "No GeoJSON data for neighborhoods, limited display."
+        "no_quartier_data_warning": "No GeoJSON data for neighborhoods, limited display.",
+        "map_mode_label": "Map display",
+        "map_mode_zones": "By area",
+        "map_mode_grid": "Aggregated grid",
+        "map_mode_help": "The grid bins donors into cells on the server: the map sent stays light whatever the number of donors.",
+        "grid_map_title": "##### Donor Density (grid)",
+        "grid_zoom_label": "Zoom level",
+        "grid_legend": "Donors per cell",
+        "grid_tooltip": "<p class='tooltip'>Map: {} cells, {} located donors, {} unlocated.</p>"
     }
 }
 
-def get_centroid(coords):
-    """Calcule le centroïde à partir de coordonnées GeoJSON (Polygon ou MultiPolygon)."""
-    flat_coords = []
-    def flatten(c):
-        if isinstance(c, (int, float)):
-            return
-        elif len(c) > 0 and isinstance(c[0], (int, float)):
-            flat_coords.append(c)
-        else:
-            for sub in c:
-                flatten(sub)
-    
-    flatten(coords)
-    if not flat_coords:
-        return [4.0511, 9.7679]  # Coordonnées par défaut si aucune coordonnée valide
-    lat = sum(c[1] for c in flat_coords) / len(flat_coords)
-    lon = sum(c[0] for c in flat_coords) / len(flat_coords)
-    return [lat, lon]
+# Zoom initial des cartes, utilisé aussi pour choisir le niveau de simplification des contours
+ARR_MAP_ZOOM = 12
+QUART_MAP_ZOOM = 11
+
+# Carte des arrondissements : choroplèthe et cercles proportionnels, plus un marqueur pour les non localisés
+def arrondissement_map(arr_counts_by_name, non_specified_arr_count, douala_non_precise_count, lang):
+    m_arr = folium.Map(location=[4.0511, 9.7679], zoom_start=ARR_MAP_ZOOM, tiles="CartoDB Positron")
+
+    # Contours simplifiés pour le zoom de la carte ; propriétés copiées (couche partagée)
+    arr_features = [dict(f, properties=dict(f['properties'])) for f in geo_layer('arrondissements', ARR_MAP_ZOOM)['features']]
+    for feature in arr_features:
+        name = feature['properties'].get('name', 'Inconnu')
+        feature['properties']['donneurs'] = int(arr_counts_by_name.get(name, 0))
+
+    folium.Choropleth(
+        geo_data={'type': 'FeatureCollection', 'features': arr_features},
+        name="choropleth",
+        data=pd.DataFrame(list(arr_counts_by_name.items()), columns=['arrondissement_de_residence_mapped', 'Nombre de Donneurs']),
+        columns=['arrondissement_de_residence_mapped', 'Nombre de Donneurs'],
+        key_on="feature.properties.name",
+        fill_color="YlOrRd",
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        legend_name=translations[lang]["arrondissement_map_legend"]
+    ).add_to(m_arr)
+
+    # Ajouter les marqueurs uniquement pour les arrondissements valides (centroïdes indexés)
+    arr_index = feature_index('arrondissements')
+    for arr_name, count in arr_counts_by_name.items():
+        entry = arr_index.get(arr_name)
+        if entry is None:
+            continue
+        folium.CircleMarker(
+            location=entry['centroid'],
+            radius=count / 5,
+            popup=f"{arr_name}: {count} donneurs" if lang == "fr" else f"{arr_name}: {count} donors",
+            color="#FF5722",
+            fill=True,
+            fill_color="#FF5722",
+            fill_opacity=0.7
+        ).add_to(m_arr)
+
+    # Ajouter un marqueur séparé pour la somme de "Non précisé" et "Douala (Non précisé)"
+    total_non_precise = non_specified_arr_count + douala_non_precise_count
+    if total_non_precise > 0:
+        popup_text = (
+            f"Non localisés: {total_non_precise} donneurs (Non précisé: {non_specified_arr_count}, Douala (Non précisé): {douala_non_precise_count})"
+            if lang == "fr" else
+            f"Unlocated: {total_non_precise} donors (Unspecified: {non_specified_arr_count}, Douala (Unspecified): {douala_non_precise_count})"
+        )
+        folium.CircleMarker(
+            location=[4.0511, 9.7679],
+            radius=total_non_precise / 5,
+            popup=popup_text,
+            color="red",
+            fill=True,
+            fill_color="red",
+            fill_opacity=0.7
+        ).add_to(m_arr)
+        folium.Marker(
+            location=[4.0511, 9.7679],
+            tooltip=popup_text,
+            icon=folium.Icon(color="red")
+        ).add_to(m_arr)
+    return m_arr
+
+# Carte des quartiers : un cercle par quartier localisé, plus un pour les non précisés
+def quartier_map(quart_counts_by_name, non_specified_quart_count, lang):
+    m_quart = folium.Map(location=[4.0511, 9.7679], zoom_start=QUART_MAP_ZOOM, tiles="CartoDB Positron")
+    quart_index = feature_index('quartiers')
+    for quart_name, count in quart_counts_by_name.items():
+        entry = quart_index.get(quart_name)
+        if quart_name == "Non précisé" or entry is None:
+            continue
+        folium.CircleMarker(
+            location=entry['centroid'],
+            radius=count / 10,
+            popup=f"{quart_name}: {count} donneurs" if lang == "fr" else f"{quart_name}: {count} donors",
+            color="#1976D2",
+            fill=True,
+            fill_color="#1976D2",
+            fill_opacity=0.7
+        ).add_to(m_quart)
+
+    if non_specified_quart_count > 0:
+        popup_text = (
+            f"Non précisé: {non_specified_quart_count} donneurs" if lang == "fr" else
+            f"Unspecified: {non_specified_quart_count} donors"
+        )
+        folium.CircleMarker(
+            location=[4.0511, 9.7679],
+            radius=non_specified_quart_count / 10,
+            popup=popup_text,
+            color="red",
+            fill=True,
+            fill_color="red",
+            fill_opacity=0.7
+        ).add_to(m_quart)
+    return m_quart
+
+# Position de chaque donneur : coordonnées géocodées (latitude/longitude) si présentes, sinon
+# centroïde de son quartier, sinon de son arrondissement ; NaN s'il n'est pas localisable
+def donor_points(df):
+    lat = pd.Series(float('nan'), index=df.index)
+    lon = pd.Series(float('nan'), index=df.index)
+    if 'latitude' in df.columns and 'longitude' in df.columns:
+        lat = pd.to_numeric(df['latitude'], errors='coerce')
+        lon = pd.to_numeric(df['longitude'], errors='coerce')
+    for layer, col in (('quartiers', 'quartier_de_residence_mapped'), ('arrondissements', 'arrondissement_de_residence_mapped')):
+        index = feature_index(layer)
+        names = df[col].astype(object)
+        lat = lat.fillna(names.map({name: entry['centroid'][0] for name, entry in index.items()}).astype(float))
+        lon = lon.fillna(names.map({name: entry['centroid'][1] for name, entry in index.items()}).astype(float))
+    return lat.to_numpy(), lon.to_numpy()
+
+# Carte agrégée : une cellule colorée par case de grille non vide (taille de la carte bornée)
+def grid_map(cells, zoom, lang):
+    m_grid = folium.Map(location=[4.0511, 9.7679], zoom_start=zoom, tiles="CartoDB Positron")
+    if cells.empty:
+        return m_grid
+    colormap = cm.LinearColormap(['#FFFFB2', '#FD8D3C', '#BD0026'], vmin=0, vmax=int(cells['count'].max()),
+                                 caption=translations[lang]["grid_legend"])
+    features = [
+        {'type': 'Feature', 'properties': {'donneurs': int(cell.count), 'color': colormap(cell.count)},
+         'geometry': {'type': 'Polygon', 'coordinates': [[
+             [round(cell.west, 5), round(cell.south, 5)], [round(cell.east, 5), round(cell.south, 5)],
+             [round(cell.east, 5), round(cell.north, 5)], [round(cell.west, 5), round(cell.north, 5)],
+             [round(cell.west, 5), round(cell.south, 5)]
+         ]]}}
+        for cell in cells.itertuples(index=False)
+    ]
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        style_function=lambda feature: {'fillColor': feature['properties']['color'], 'color': '#BD0026',
+                                        'weight': 0.5, 'fillOpacity': 0.7},
+        tooltip=folium.GeoJsonTooltip(fields=['donneurs'], aliases=[translations[lang]["grid_legend"]])
+    ).add_to(m_grid)
+    colormap.add_to(m_grid)
+    return m_grid
 
 def show_cartographie(df_unused, lang="fr"):
     st.header(translations[lang]["header"])
@@ -111,184 +249,94 @@ def show_cartographie(df_unused, lang="fr"):
         'Douala 4': 'Douala IV', 'Douala 5': 'Douala V', 'Douala 6': 'Douala VI'
     })
 
-    # Charger le fichier GeoJSON une seule fois
+    # Couches GeoJSON (chargées et simplifiées une seule fois par processus)
     try:
-        url = "https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/map/douala_arrondissements.geojson"
-        response = requests.get(url)
-        response.raise_for_status()  # Lève une exception si la requête échoue
-        geojson_data = json.loads(response.text)
-    except requests.exceptions.RequestException:
+        geo_layers()
+    except (requests.exceptions.RequestException, OSError, ValueError):
         st.error(translations[lang]["geojson_error"])
         return
 
-    # Ligne 1 : Cartes Folium
-    st.subheader(translations[lang]["map_subheader"])
-    with st.container():
-        col1, col2 = st.columns(2)
-
-        # Carte 1 : Arrondissements
-        with col1:
-            st.markdown(translations[lang]["arrondissement_map_title"])
-            arrondissement_counts = df['arrondissement_de_residence'].value_counts().reset_index()
-            arrondissement_counts.columns = ['arrondissement_de_residence', 'Nombre de Donneurs']
-            m_arr = folium.Map(location=[4.0511, 9.7679], zoom_start=12, tiles="CartoDB Positron")
-
-            arr_features = [f for f in geojson_data['features'] if f['properties'].get('admin_level') == "8"]
-            geojson_arr = {'type': 'FeatureCollection', 'features': arr_features}
-
-            arr_names_geojson = [f['properties'].get('name', 'Inconnu') for f in arr_features]
-            arr_name_mapping = {}
-            non_specified_arr_count = 0
-            douala_non_precise_count = 0
-            for df_name in arrondissement_counts['arrondissement_de_residence']:
-                if df_name.lower() in ['non précisé', 'unknown', 'n/a', '']:
-                    arr_name_mapping[df_name] = "Non précisé"
-                    non_specified_arr_count += arrondissement_counts[arrondissement_counts['arrondissement_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
-                elif "Douala (Non précisé)" in df_name:
-                    arr_name_mapping[df_name] = "Non précisé"
-                    douala_non_precise_count += arrondissement_counts[arrondissement_counts['arrondissement_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
-                else:
-                    match = process.extractOne(df_name, arr_names_geojson)
-                    if match and match[1] >= 80:
-                        arr_name_mapping[df_name] = match[0]
-                    else:
-                        arr_name_mapping[df_name] = df_name
+    # Correspondance des noms saisis vers les noms du GeoJSON (arrondissements)
+    arrondissement_counts = df['arrondissement_de_residence'].value_counts().reset_index()
+    arrondissement_counts.columns = ['arrondissement_de_residence', 'Nombre de Donneurs']
+    arr_matches = resolve_names('arrondissements', arrondissement_counts['arrondissement_de_residence'])
+    arr_name_mapping = {}
+    non_specified_arr_count = 0
+    douala_non_precise_count = 0
+    for df_name in arrondissement_counts['arrondissement_de_residence']:
+        if df_name.lower() in ['non précisé', 'unknown', 'n/a', '']:
+            arr_name_mapping[df_name] = "Non précisé"
+            non_specified_arr_count += arrondissement_counts[arrondissement_counts['arrondissement_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
+        elif "Douala (Non précisé)" in df_name:
+            arr_name_mapping[df_name] = "Non précisé"
+            douala_non_precise_count += arrondissement_counts[arrondissement_counts['arrondissement_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
+        else:
+            arr_name_mapping[df_name] = arr_matches[df_name]
 
-            df['arrondissement_de_residence_mapped'] = df['arrondissement_de_residence'].map(arr_name_mapping)
-            arrondissement_counts_mapped = df['arrondissement_de_residence_mapped'].value_counts().reset_index()
-            arrondissement_counts_mapped.columns = ['arrondissement_de_residence_mapped', 'Nombre de Donneurs']
+    df['arrondissement_de_residence_mapped'] = df['arrondissement_de_residence'].map(arr_name_mapping)
+    arrondissement_counts_mapped = df['arrondissement_de_residence_mapped'].value_counts().reset_index()
+    arrondissement_counts_mapped.columns = ['arrondissement_de_residence_mapped', 'Nombre de Donneurs']
 
-            # Filtrer "Non précisé" pour le Choropleth
-            arrondissement_counts_valid = arrondissement_counts_mapped[arrondissement_counts_mapped['arrondissement_de_residence_mapped'] != "Non précisé"]
+    # Filtrer "Non précisé" pour le Choropleth
+    arrondissement_counts_valid = arrondissement_counts_mapped[arrondissement_counts_mapped['arrondissement_de_residence_mapped'] != "Non précisé"]
+    arr_counts_by_name = dict(zip(arrondissement_counts_valid['arrondissement_de_residence_mapped'], arrondissement_counts_valid['Nombre de Donneurs'].tolist()))
 
-            for feature in arr_features:
-                name = feature['properties'].get('name', 'Inconnu')
-                count = arrondissement_counts_valid[arrondissement_counts_valid['arrondissement_de_residence_mapped'] == name]['Nombre de Donneurs'].values
-                feature['properties']['donneurs'] = int(count[0]) if len(count) > 0 else 0
+    # Correspondance des noms saisis vers les noms du GeoJSON (quartiers)
+    quartier_counts = df['quartier_de_residence'].value_counts().reset_index()
+    quartier_counts.columns = ['quartier_de_residence', 'Nombre de Donneurs']
+    quart_matches = resolve_names('quartiers', quartier_counts['quartier_de_residence'])
+    name_mapping = {}
+    non_specified_quart_count = 0
+    for df_name in quartier_counts['quartier_de_residence']:
+        if df_name.lower() in ['non précisé', 'unknown', 'n/a', '']:
+            name_mapping[df_name] = "Non précisé"
+            non_specified_quart_count += quartier_counts[quartier_counts['quartier_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
+        else:
+            name_mapping[df_name] = quart_matches[df_name]
 
-            folium.Choropleth(
-                geo_data=geojson_arr,
-                name="choropleth",
-                data=arrondissement_counts_valid,
-                columns=['arrondissement_de_residence_mapped', 'Nombre de Donneurs'],
-                key_on="feature.properties.name",
-                fill_color="YlOrRd",
-                fill_opacity=0.7,
-                line_opacity=0.2,
-                legend_name=translations[lang]["arrondissement_map_legend"]
-            ).add_to(m_arr)
+    df['quartier_de_residence_mapped'] = df['quartier_de_residence'].map(name_mapping)
+    quartier_counts_mapped = df['quartier_de_residence_mapped'].value_counts().reset_index()
+    quartier_counts_mapped.columns = ['quartier_de_residence_mapped', 'Nombre de Donneurs']
+    quart_counts_by_name = dict(zip(quartier_counts_mapped['quartier_de_residence_mapped'], quartier_counts_mapped['Nombre de Donneurs'].tolist()))
 
-            # Ajouter les marqueurs uniquement pour les arrondissements valides
-            for _, row in arrondissement_counts_valid.iterrows():
-                arr_name = row['arrondissement_de_residence_mapped']
-                count = row['Nombre de Donneurs']
-                for feature in arr_features:
-                    if feature['properties'].get('name') == arr_name:
-                        coords = feature['geometry']['coordinates']
-                        centroid = get_centroid(coords)
-                        folium.CircleMarker(
-                            location=centroid,
-                            radius=count / 5,
-                            popup=f"{arr_name}: {count} donneurs" if lang == "fr" else f"{arr_name}: {count} donors",
-                            color="#FF5722",
-                            fill=True,
-                            fill_color="#FF5722",
-                            fill_opacity=0.7
-                        ).add_to(m_arr)
+    # Ligne 1 : Cartes Folium (par zone, ou grille agrégée côté serveur)
+    st.subheader(translations[lang]["map_subheader"])
+    map_mode = st.radio(
+        translations[lang]["map_mode_label"],
+        [translations[lang]["map_mode_zones"], translations[lang]["map_mode_grid"]],
+        horizontal=True, help=translations[lang]["map_mode_help"], key="cartographie_map_mode"
+    )
+    with st.container():
+        if map_mode == translations[lang]["map_mode_grid"]:
+            st.markdown(translations[lang]["grid_map_title"])
+            grid_zoom = st.select_slider(translations[lang]["grid_zoom_label"], options=list(ZOOM_LEVELS), value=ARR_MAP_ZOOM, key="cartographie_grid_zoom")
+            lat, lon = donor_points(df)
+            cells = grid_cells(lat, lon, grid_zoom)
+            located = int(cells['count'].sum())
+            show_cached_map(('carte grille', cells, grid_zoom, lang), lambda: grid_map(cells, grid_zoom, lang))
+            st.markdown(translations[lang]["grid_tooltip"].format(len(cells), located, len(df) - located), unsafe_allow_html=True)
+        else:
+            col1, col2 = st.columns(2)
 
-            # Ajouter un marqueur séparé pour la somme de "Non précisé" et "Douala (Non précisé)"
-            total_non_precise = non_specified_arr_count + douala_non_precise_count
-            if total_non_precise > 0:
-                popup_text = (
-                    f"Non localisés: {total_non_precise} donneurs (Non précisé: {non_specified_arr_count}, Douala (Non précisé): {douala_non_precise_count})"
-                    if lang == "fr" else
-                    f"Unlocated: {total_non_precise} donors (Unspecified: {non_specified_arr_count}, Douala (Unspecified): {douala_non_precise_count})"
+            # Carte 1 : Arrondissements
+            with col1:
+                st.markdown(translations[lang]["arrondissement_map_title"])
+                show_cached_map(
+                    ('carte arrondissements', tuple(arr_counts_by_name.items()), int(non_specified_arr_count), int(douala_non_precise_count), lang, ARR_MAP_ZOOM),
+                    lambda: arrondissement_map(arr_counts_by_name, non_specified_arr_count, douala_non_precise_count, lang)
                 )
-                folium.CircleMarker(
-                    location=[4.0511, 9.7679],
-                    radius=total_non_precise / 5,
-                    popup=popup_text,
-                    color="red",
-                    fill=True,
-                    fill_color="red",
-                    fill_opacity=0.7
-                ).add_to(m_arr)
-                folium.Marker(
-                    location=[4.0511, 9.7679],
-                    tooltip=popup_text,
-                    icon=folium.Icon(color="red")
-                ).add_to(m_arr)
+                st.markdown(translations[lang]["arrondissement_map_tooltip"], unsafe_allow_html=True)
 
-            folium_static(m_arr)
-            st.markdown(translations[lang]["arrondissement_map_tooltip"], unsafe_allow_html=True)
-
-        # Carte 2 : Quartiers
-        with col2:
-            st.markdown(translations[lang]["quartier_map_title"])
-            quartier_counts = df['quartier_de_residence'].value_counts().reset_index()
-            quartier_counts.columns = ['quartier_de_residence', 'Nombre de Donneurs']
-            m_quart = folium.Map(location=[4.0511, 9.7679], zoom_start=11, tiles="CartoDB Positron")
-
-            quart_features = [f for f in geojson_data['features'] if f['properties'].get('place') == "suburb"]
-            geojson_quart = {'type': 'FeatureCollection', 'features': quart_features}
-
-            quart_names_geojson = [f['properties'].get('name', 'Inconnu') for f in quart_features]
-            name_mapping = {}
-            non_specified_quart_count = 0
-            for df_name in quartier_counts['quartier_de_residence']:
-                if df_name.lower() in ['non précisé', 'unknown', 'n/a', '']:
-                    name_mapping[df_name] = "Non précisé"
-                    non_specified_quart_count += quartier_counts[quartier_counts['quartier_de_residence'] == df_name]['Nombre de Donneurs'].values[0]
-                else:
-                    match = process.extractOne(df_name, quart_names_geojson)
-                    if match and match[1] >= 60:
-                        name_mapping[df_name] = match[0]
-                    else:
-                        name_mapping[df_name] = df_name
-
-            df['quartier_de_residence_mapped'] = df['quartier_de_residence'].map(name_mapping)
-            quartier_counts_mapped = df['quartier_de_residence_mapped'].value_counts().reset_index()
-            quartier_counts_mapped.columns = ['quartier_de_residence_mapped', 'Nombre de Donneurs']
-
-            if geojson_quart['features']:
-                for _, row in quartier_counts_mapped.iterrows():
-                    quart_name = row['quartier_de_residence_mapped']
-                    count = row['Nombre de Donneurs']
-                    if quart_name == "Non précisé":
-                        continue
-                    for feature in quart_features:
-                        if feature['properties'].get('name') == quart_name:
-                            coords = feature['geometry']['coordinates']
-                            centroid = get_centroid(coords)
-                            folium.CircleMarker(
-                                location=centroid,
-                                radius=count / 10,
-                                popup=f"{quart_name}: {count} donneurs" if lang == "fr" else f"{quart_name}: {count} donors",
-                                color="#1976D2",
-                                fill=True,
-                                fill_color="#1976D2",
-                                fill_opacity=0.7
-                            ).add_to(m_quart)
-            else:
-                st.warning(translations[lang]["no_quartier_data_warning"])
-
-            if non_specified_quart_count > 0:
-                popup_text = (
-                    f"Non précisé: {non_specified_quart_count} donneurs" if lang == "fr" else
-                    f"Unspecified: {non_specified_quart_count} donors"
+            # Carte 2 : Quartiers
+            with col2:
+                st.markdown(translations[lang]["quartier_map_title"])
+                if not geo_layer('quartiers')['features']:
+                    st.warning(translations[lang]["no_quartier_data_warning"])
+                show_cached_map(
+                    ('carte quartiers', tuple(quart_counts_by_name.items()), int(non_specified_quart_count), lang, QUART_MAP_ZOOM),
+                    lambda: quartier_map(quart_counts_by_name, non_specified_quart_count, lang)
                 )
-                folium.CircleMarker(
-                    location=[4.0511, 9.7679],
-                    radius=non_specified_quart_count / 10,
-                    popup=popup_text,
-                    color="red",
-                    fill=True,
-                    fill_color="red",
-                    fill_opacity=0.7
-                ).add_to(m_quart)
-
-            folium_static(m_quart)
-            st.markdown(translations[lang]["quartier_map_tooltip"], unsafe_allow_html=True)
+                st.markdown(translations[lang]["quartier_map_tooltip"], unsafe_allow_html=True)
 
     # Ligne 2 : Répartition Géographique
     st.subheader(translations[lang]["geo_distribution_subheader"])
@@ -312,7 +360,8 @@ def show_cartographie(df_unused, lang="fr"):
         with col2:
             st.markdown(translations[lang]["sankey_title"])
             top_quartiers = df.groupby(['arrondissement_de_residence_mapped', 'quartier_de_residence_mapped']).size().reset_index(name='count')
-            top_quartiers = top_quartiers.groupby('arrondissement_de_residence_mapped').apply(lambda x: x.nlargest(5, 'count')).reset_index(drop=True)
+            top_quartiers = (top_quartiers.sort_values(['arrondissement_de_residence_mapped', 'count'], ascending=[True, False], kind='stable')
+                             .groupby('arrondissement_de_residence_mapped').head(5).reset_index(drop=True))
             sankey_data = [{'source': row['arrondissement_de_residence_mapped'], 'target': row['quartier_de_residence_mapped'], 'value': row['count']} for _, row in top_quartiers.iterrows()]
             nodes = list(set([d['source'] for d in sankey_data] + [d['target'] for d in sankey_data]))
             node_dict = {node: i for i, node in enumerate(nodes)}
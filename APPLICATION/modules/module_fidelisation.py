@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+from data_store import load_dataset
 
 # Dictionnaire de traductions pour le module Fidélisation des Donneurs
 translations = {
@@ -87,7 +88,7 @@ translations = {
 
 @st.cache_data
 def load_data():
-    df = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/volontaire_clean_corrige.csv')
+    df = load_dataset('volontaire').copy()
     return df
 
 def show_fidelisation(df_unused=None, lang="fr"):
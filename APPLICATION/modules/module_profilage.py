@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
+from disk_cache import disk_cached
 
 # Dictionnaire de traductions pour le module Profilage des Donneurs
 translations = {
@@ -76,6 +77,14 @@ translations = {
     }
 }
 
+# Affectation des clusters K-means (standardisation comprise), mise en cache sur disque
+@disk_cached('kmeans')
+def cluster_labels(df_clustering, n_clusters):
+    scaler = StandardScaler()
+    df_clustering_scaled = scaler.fit_transform(df_clustering)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    return kmeans.fit_predict(df_clustering_scaled)
+
 def show_profilage(df_unused, lang="fr"):
     st.header(translations[lang]["header"])
 
@@ -106,14 +115,11 @@ def show_profilage(df_unused, lang="fr"):
     categorical_cols = ['genre', 'profession', 'arrondissement_de_residence', 'eligibilite_au_don']
     df_encoded = pd.get_dummies(df[categorical_cols], columns=categorical_cols)
     df_clustering = pd.concat([df[clustering_cols], df_encoded], axis=1)
-    scaler = StandardScaler()
-    df_clustering_scaled = scaler.fit_transform(df_clustering)
 
     # Clustering avec K-means
     st.subheader(translations[lang]["clustering_subheader"])
     n_clusters = st.slider(translations[lang]["n_clusters_label"], 2, 10, 4, help=translations[lang]["n_clusters_help"])
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    df['cluster'] = kmeans.fit_predict(df_clustering_scaled)
+    df['cluster'] = cluster_labels(df_clustering, n_clusters)
 
     # Ligne 1 : Visualisation des Clusters
     with st.container():
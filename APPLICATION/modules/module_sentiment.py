@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import numpy as np
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from data_store import load_dataset
+from disk_cache import disk_cached
 
 # Dictionnaire de traductions pour le module Analyse de Sentiment
 translations = {
@@ -94,11 +96,12 @@ translations = {
 
 @st.cache_data
 def load_data():
-    df_volontaires = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/volontaire_clean_corrige.csv')
-    df_dates = pd.read_csv('https://raw.githubusercontent.com/hyontnick/qganalytics_blood_dashboard_indabax/main/APPLICATION/datas/dates_2019_extraites.csv')
+    df_volontaires = load_dataset('volontaire')
+    df_dates = load_dataset('dates_2019')
     df_merged = df_volontaires.merge(df_dates, left_index=True, right_index=True, how='left')
     return df_merged
 
+@disk_cached('sentiment')
 def analyze_sentiment(texts):
     """Analyse vectorisée des sentiments avec VADER."""
     analyzer = SentimentIntensityAnalyzer()
@@ -7,6 +7,7 @@ import plotly.graph_objects as go
 from datetime import datetime
 import base64
 import urllib.parse
+from data_store import load_users
 
 DB_PATH = "blood_donation_users.db"
 
@@ -82,9 +83,8 @@ def init_db():
 
 def get_data():
     init_db()
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM users ORDER BY timestamp DESC", conn)
-    conn.close()
+    # Table partagée (préchargée, relue quand la base change) : travailler sur une copie
+    df = load_users().copy()
     df["timestamp"] = pd.to_datetime(df["timestamp"])
     df["email_sent"] = pd.to_datetime(df["email_sent"], errors="coerce")
     df["whatsapp_sent"] = pd.to_datetime(df["whatsapp_sent"], errors="coerce")
@@ -0,0 +1,124 @@
+# name_resolver.py
+# Résolution des noms saisis (arrondissements, quartiers) vers les noms du GeoJSON.
+# Chaque orthographe n'est comparée qu'une fois : la table est persistée sur disque par version
+# du GeoJSON et les nouvelles orthographes y sont ajoutées au fil de l'eau. Le score est celui de
+# fuzzywuzzy (WRatio, comme process.extractOne), calculé sur les seuls noms partageant le plus de
+# trigrammes avec la saisie. Les corrections manuelles (map/name_overrides.json) priment sur la table.
+import os
+import json
+import time
+import threading
+from collections import Counter, defaultdict
+import streamlit as st
+from fuzzywuzzy import fuzz, utils
+from disk_cache import CACHE_DIR, content_key
+from geo_store import geo_layer
+from instrumentation import record
+
+# Incrémenter quand le calcul des correspondances change (les tables existantes sont ignorées)
+RESOLVER_VERSION = 1
+
+TABLE_DIR = os.environ.get('QG_NAME_TABLE_DIR', os.path.join(CACHE_DIR, 'name_resolution'))
+OVERRIDES_PATH = os.environ.get('QG_NAME_OVERRIDES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'map', 'name_overrides.json'))
+
+# Score minimal pour accepter une correspondance (sinon le nom saisi est gardé)
+THRESHOLDS = {'arrondissements': 80, 'quartiers': 60}
+# Candidats scorés par saisie, choisis par nombre de trigrammes communs
+MAX_CANDIDATES = 20
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameResolver:
+    def __init__(self, layer, choices):
+        self.layer = layer
+        self.choices = list(choices)
+        self.processed = [utils.full_process(choice) for choice in self.choices]
+        self.gram_index = defaultdict(list)
+        for position, processed in enumerate(self.processed):
+            for gram in trigrams(processed):
+                self.gram_index[gram].append(position)
+        self.version = content_key(RESOLVER_VERSION, layer, self.choices)[:16]
+        self.path = os.path.join(TABLE_DIR, f"{layer}-{self.version}.json")
+        self.lock = threading.Lock()
+        self.matches = self.load_table()
+
+    def load_table(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)['matches']
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def save_table(self):
+        try:
+            os.makedirs(TABLE_DIR, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"layer": self.layer, "version": self.version, "matches": self.matches}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # dossier en lecture seule : la table reste en mémoire pour ce processus
+
+    # Meilleur nom du GeoJSON et son score ; à score égal le premier dans l'ordre du GeoJSON
+    def best_match(self, name):
+        query = utils.full_process(name)
+        if not query:
+            return None, 0
+        shared = Counter(position for gram in trigrams(query) for position in self.gram_index.get(gram, ()))
+        candidates = sorted(position for position, _ in shared.most_common(MAX_CANDIDATES)) if shared else range(len(self.choices))
+        best, best_score = None, 0
+        for position in candidates:
+            score = fuzz.WRatio(query, self.processed[position])
+            if best is None or score > best_score:
+                best, best_score = self.choices[position], score
+        return best, best_score
+
+    # Nom du GeoJSON pour chaque saisie (la saisie elle-même sous le seuil) ; seules les
+    # orthographes absentes de la table sont calculées, puis enregistrées
+    def resolve(self, names, threshold):
+        overrides = load_overrides().get(self.layer, {})
+        missing = [name for name in dict.fromkeys(names) if name not in overrides and name not in self.matches]
+        if missing:
+            with self.lock:
+                start = time.perf_counter()
+                for name in missing:
+                    if name not in self.matches:
+                        self.matches[name] = list(self.best_match(name))
+                record(f"résolution noms {self.layer}", time.perf_counter() - start)
+                self.save_table()
+        mapping = {}
+        for name in names:
+            if name in overrides:
+                mapping[name] = overrides[name]
+            else:
+                match, score = self.matches[name]
+                mapping[name] = match if match is not None and score >= threshold else name
+        return mapping
+
+# Corrections manuelles {couche: {saisie: nom GeoJSON}}, relues seulement quand le fichier change
+def overrides_signature():
+    try:
+        stat = os.stat(OVERRIDES_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def read_overrides(signature):
+    if signature is None:
+        return {}
+    with open(OVERRIDES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_overrides():
+    return read_overrides(overrides_signature())
+
+@st.cache_resource(show_spinner=False)
+def name_resolver(layer, choices):
+    return NameResolver(layer, choices)
+
+def resolve_names(layer, names):
+    choices = tuple((f.get('properties') or {}).get('name', 'Inconnu') for f in geo_layer(layer)['features'])
+    return name_resolver(layer, choices).resolve(list(names), THRESHOLDS[layer])
@@ -0,0 +1,84 @@
+# test_compiled_forest.py
+# La forêt aplatie (CompiledForest) doit donner les mêmes probabilités que predict_proba de
+# scikit-learn, sur des lignes réelles encodées et standardisées comme par l'API, y compris pour
+# des valeurs situées exactement sur les seuils de découpe (conversion float32 de scikit-learn).
+# À lancer depuis la racine du dépôt ou depuis APPLICATION/ : python -m pytest APPLICATION/tests
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+APPLICATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APPLICATION_DIR)
+
+from api.api import (CompiledForest, FeatureEncoder, PredictionInput, MODEL_DIR, MODEL_FILE,
+                     SCALER_FILE, ENCODERS_FILE)
+
+MODEL_PATH = os.path.join(APPLICATION_DIR, MODEL_DIR)
+DATA_PATH = os.path.join(APPLICATION_DIR, 'datas', 'volontaire_clean_corrige.csv')
+
+# Lignes du jeu de volontaires encodées puis standardisées, et cible binaire (éligible ou non)
+@pytest.fixture(scope='module')
+def encoded_rows():
+    df = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    records = [PredictionInput(**record).dict() for record in df.to_dict('records')]
+    encoder = FeatureEncoder(joblib.load(os.path.join(MODEL_PATH, ENCODERS_FILE)))
+    scaler = joblib.load(os.path.join(MODEL_PATH, SCALER_FILE))
+    X = encoder.encode_batch(records)
+    X = (X - scaler.mean_) / scaler.scale_
+    y = (df['eligibilite_au_don'] == 'Eligible').to_numpy(dtype=int)
+    return X, y
+
+# Lignes dont une variable est placée sur le seuil d'un nœud interne, et juste de part et d'autre
+def threshold_rows(model, X, n_nodes=200, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        internal = np.flatnonzero(tree.children_left != -1)
+        for node in rng.choice(internal, size=min(len(internal), n_nodes // len(model.estimators_) + 1), replace=False):
+            threshold = tree.threshold[node]
+            for value in (threshold, np.nextafter(threshold, -np.inf), np.nextafter(threshold, np.inf),
+                          np.float32(threshold), np.nextafter(np.float32(threshold), np.float32(np.inf))):
+                row = X[rng.integers(len(X))].copy()
+                row[tree.feature[node]] = value
+                rows.append(row)
+    return np.array(rows)
+
+def assert_same_proba(model, X):
+    expected = model.predict_proba(X)
+    compiled = CompiledForest.from_estimators(model.estimators_).predict_proba(X)
+    assert compiled.shape == expected.shape
+    assert np.allclose(compiled, expected)
+
+@pytest.mark.parametrize('forest_class', [RandomForestClassifier, ExtraTreesClassifier])
+@pytest.mark.parametrize('min_samples_leaf', [1, 5])
+def test_matches_sklearn_on_encoded_rows(encoded_rows, forest_class, min_samples_leaf):
+    X, y = encoded_rows
+    model = forest_class(n_estimators=25, min_samples_leaf=min_samples_leaf, random_state=0).fit(X, y)
+    assert_same_proba(model, X)
+    assert_same_proba(model, threshold_rows(model, X))
+
+def test_matches_sklearn_with_class_weights(encoded_rows):
+    X, y = encoded_rows
+    model = RandomForestClassifier(n_estimators=25, class_weight='balanced', random_state=0).fit(X, y)
+    assert_same_proba(model, X)
+    assert_same_proba(model, threshold_rows(model, X))
+
+def test_saved_forest_loads_with_mmap(encoded_rows, tmp_path):
+    X, y = encoded_rows
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    directory = str(tmp_path / 'compiled')
+    CompiledForest.from_estimators(model.estimators_).save(directory)
+    assert np.allclose(CompiledForest.load(directory).predict_proba(X), model.predict_proba(X))
+
+# Modèle de production, s'il est présent (il n'est pas versionné)
+@pytest.mark.skipif(not os.path.exists(os.path.join(MODEL_PATH, MODEL_FILE)), reason="modèle de production absent")
+def test_matches_production_model(encoded_rows):
+    X, _ = encoded_rows
+    model = joblib.load(os.path.join(MODEL_PATH, MODEL_FILE))
+    assert_same_proba(model, X)
+    assert_same_proba(model, threshold_rows(model, X))